@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+from hardware import *
+from so import *
+from sweep import SCHEDULERS, makeConfig, runConfig
+from tabulate import tabulate
+import multiprocessing
+import json
+import platform
+import resource
+import sys
+import time
+
+
+"""
+fib 0 = 0
+fib 1 = 1
+fib n = fib (n-1) + fib (n-2)
+(the program of fibmain.py)
+"""
+def fibo(x):
+    return Program([
+        ASM.HEADER(16),
+        ASM.STORA(x),
+        ASM.CALL('FIB'),
+        ASM.EXIT(1),
+        ASM.LABEL('FIB'),    # fib(n), A = n
+        ASM.STORB('0'),
+        ASM.CMPAB(),
+        ASM.JZ('RETORNO'),   # B = fib(n)
+        ASM.STORB('1'),
+        ASM.CMPAB(),
+        ASM.JZ('RETORNO'),   # B = fib(n)
+        ASM.DECA(1),         # n-1
+        ASM.IO(),            # add IO to preemtives scheduling
+        ASM.PUSHA(),
+        ASM.CALL('FIB'),     # fib(n-1)
+        ASM.POPA(),
+        ASM.PUSHB(),         # save B = fib(n-1)
+        ASM.DECA(1),         # n-2
+        ASM.CALL('FIB'),     # B = fib(n-2)
+        ASM.POPA(),          # A = saved B = fib(n-1)
+        ASM.ADDAB(),         # A = fib(n-1) + fib(n-2)
+        ASM.PUSHA(),
+        ASM.POPB(),          # B = fib(n-1) + fib(n-2)
+        ASM.LABEL('RETORNO'),
+        ASM.RET()
+        ])
+
+
+# CALL RET Stack TEST (main.py)
+def calltest():
+    return Program([
+        ASM.HEADER(4),
+        ASM.JMP(9),
+        ASM.INCA(1),
+        ASM.INCB(1),
+        ASM.RET(),
+        ASM.CALL(6),
+        ASM.CALL(6),
+        ASM.CALL(6)
+        ])
+
+
+## canonical workloads: name -> (memory size, frame size, workload)
+## a workload is a list of (path, program, priority), see sweep.runConfig
+def workloads():
+    cpuIoMix = [
+        ("/prg1", Program([ASM.CPU(2), ASM.IO(), ASM.CPU(3), ASM.IO(), ASM.CPU(2)]), 1),
+        ("/prg2", Program([ASM.INCA(3), ASM.CPU(4)]), 0),
+        ("/prg3", Program([ASM.CPU(3), ASM.IO(), ASM.CPU(1)]), 0),
+    ]
+    benchmarks = {
+        'calltest': (32, 4, [("/bin/calltest", calltest(), 1)]),
+        'mix': (8, 4, cpuIoMix),
+        'mix x4': (32, 4, [("{}.{}".format(path, n), program, priority)
+                           for n in range(0, 4) for (path, program, priority) in cpuIoMix]),
+    }
+    for n in [6, 8, 10]:
+        benchmarks['fib {}'.format(n)] = (32, 4, [("/bin/fib", fibo(n), 1)])
+    # cpu bound bursts, plain and encoded with REP (see ASM.peephole)
+    for optimize in [False, True]:
+        name = 'cpu 1000 rep' if optimize else 'cpu 1000'
+        benchmarks[name] = (32, 4, [
+            ("/bin/cpu{}".format(n), Program([ASM.CPU(1000), ASM.IO(), ASM.INCA(1000)], optimize), 0)
+            for n in range(0, 3)])
+    return benchmarks
+
+
+## runs a benchmark, measures the host time and the peak memory
+## of the (fresh) process that ran it
+def runBenchmark(name, scheduler, quantum = 2, maxTicks = 1000000):
+    (memory, frameSize, workload) = workloads()[name]
+    config = makeConfig(scheduler, quantum, memory, frameSize)
+    start = time.perf_counter()
+    result = runConfig(config, workload, maxTicks)
+    wall = time.perf_counter() - start
+    result.update(config)
+    result['benchmark'] = name
+    result['wall'] = wall
+    result['ips'] = result['instructions'] / wall
+    result['tps'] = result['ticks'] / wall
+    # kilobytes in linux
+    result['peakMemory'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result
+
+
+def runBenchmarkArgs(args):
+    return runBenchmark(*args)
+
+
+## every benchmark under every scheduler, one at a time and each one
+## in a new process (so the peak memory is the one of the benchmark)
+def runAll(names = None, schedulers = None):
+    names = sorted(workloads()) if names is None else names
+    schedulers = sorted(SCHEDULERS) if schedulers is None else schedulers
+    runs = [(name, scheduler) for name in names for scheduler in schedulers]
+    with multiprocessing.Pool(1, maxtasksperchild = 1) as pool:
+        results = pool.map(runBenchmarkArgs, runs, chunksize = 1)
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def table(report):
+    rows = []
+    for result in report['results']:
+        rows.append([
+            result['benchmark'],
+            result['scheduler'],
+            result['ticks'] if result['finished'] else '>{}'.format(result['ticks']),
+            result['instructions'],
+            '{:.4f}'.format(result['wall']),
+            '{:.0f}'.format(result['ips']),
+            '{:.0f}'.format(result['tps']),
+            result['peakMemory'],
+        ])
+    headers = ['benchmark', 'scheduler', 'ticks', 'instructions',
+               'wall (s)', 'instr/s', 'ticks/s', 'peak mem (KB)']
+    return tabulate(rows, headers, tablefmt='psql')
+
+
+##
+##  MAIN
+##  python bench.py [report.json]
+##
+if __name__ == '__main__':
+    report = runAll()
+    print(table(report))
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'w') as f:
+            json.dump(report, f, indent = 1)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+from hardware import *
+from array import array
+import mmap
+import struct
+import sys
+
+
+## binary execution trace: a header and fixed size records of native
+## 32 bit ints, one per executed instruction, irq or context switch
+TRACE_MAGIC = b'MSOTRACE'
+TRACE_HEADER = struct.Struct('=8sII') # magic, version, fields per record
+TRACE_VERSION = 1
+
+## fields of a record
+## code: opcode (see OPCODES) of an instruction, irq type (see IRQ_TYPES)
+## pc: address of the instruction, a, b, sp, zf: registers after it
+## (IO and EXIT: before their irq)
+TRACE_FIELDS = ('tick', 'kind', 'core', 'pid', 'pc', 'code', 'a', 'b', 'sp', 'zf')
+
+## kinds of record
+RECORD_EXEC   = 0
+RECORD_IRQ    = 1
+RECORD_SWITCH = 2
+
+IRQ_TYPES = [
+    KILL_INTERRUPTION_TYPE,
+    IO_IN_INTERRUPTION_TYPE,
+    IO_OUT_INTERRUPTION_TYPE,
+    NEW_INTERRUPTION_TYPE,
+    TIMEOUT_INTERRUPTION_TYPE,
+    PAGE_FAULT_INTERRUPTION_TYPE,
+    RELEASE_INTERRUPTION_TYPE,
+    ]
+IRQ_CODE = {irqType: code for (code, irqType) in enumerate(IRQ_TYPES)}
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+
+## writes the trace of a Hardware (see Hardware.binaryTrace)
+## records are buffered and appended to the file in chunks
+class BinaryTraceWriter():
+
+    def __init__(self, path, bufferRecords = 65536):
+        self._file = open(path, 'wb')
+        self._file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, len(TRACE_FIELDS)))
+        self._buffer = array('i')
+        self._bufferSize = bufferRecords * len(TRACE_FIELDS)
+        self._pids = dict() # core -> pid running (-1: none)
+        self._records = 0
+
+    @property
+    def records(self):
+        return self._records
+
+    def execute(self, tickNbr, core, pc, opcode, a, b, sp, zf):
+        self._append((tickNbr, RECORD_EXEC, core, self._pids.get(core, -1), pc, opcode, a, b, sp, zf))
+
+    def interruption(self, tickNbr, irq):
+        core = -1 if irq.core is None else irq.core
+        self._append((tickNbr, RECORD_IRQ, core, self._pids.get(core, -1), -1,
+                      IRQ_CODE.get(irq.type, -1), -1, -1, -1, 0))
+
+    # pid starts (or stops, pid -1) running on core
+    def switch(self, tickNbr, core, pid):
+        self._pids[core] = pid
+        self._append((tickNbr, RECORD_SWITCH, core, pid, -1, -1, -1, -1, -1, 0))
+
+    def _append(self, record):
+        size = len(self._buffer)
+        try:
+            self._buffer.extend(record)
+        except (TypeError, OverflowError):
+            # a register with a non int value (popped from code)
+            del self._buffer[size:]
+            self._buffer.extend(self._int(value) for value in record)
+        self._records += 1
+        if len(self._buffer) >= self._bufferSize:
+            self.flush()
+
+    def _int(self, value):
+        if isinstance(value, int) and INT_MIN <= value <= INT_MAX:
+            return value
+        return -1
+
+    def flush(self):
+        self._buffer.tofile(self._file)
+        self._buffer = array('i')
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+## reads a trace file memory mapped: columns are memoryviews over the
+## file (no copy, no parsing). Release the columns before close()
+class BinaryTraceReader():
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        (magic, version, fields) = TRACE_HEADER.unpack_from(self._map)
+        if magic != TRACE_MAGIC or version != TRACE_VERSION or fields != len(TRACE_FIELDS):
+            self.close()
+            raise Exception("{path} is not a trace file (version {version})".format(path = path, version = TRACE_VERSION))
+        self._data = memoryview(self._map)[TRACE_HEADER.size:].cast('i')
+
+    @property
+    def fields(self):
+        return TRACE_FIELDS
+
+    def __len__(self):
+        return len(self._data) // len(TRACE_FIELDS)
+
+    # a field of every record (see TRACE_FIELDS)
+    def column(self, name):
+        return self._data[TRACE_FIELDS.index(name)::len(TRACE_FIELDS)]
+
+    def record(self, index):
+        start = index * len(TRACE_FIELDS)
+        return tuple(self._data[start:start + len(TRACE_FIELDS)])
+
+    def describe(self, index):
+        (tickNbr, kind, core, pid, pc, code, a, b, sp, zf) = self.record(index)
+        if kind == RECORD_EXEC:
+            return "{:>8} core {} pid {:>3} PC={:>3} {:<6} A={:>3} B={:>3} SP={:>3} zflag={}".format(
+                    tickNbr, core, pid, pc, OPCODES[code], a, b, sp, bool(zf))
+        if kind == RECORD_IRQ:
+            return "{:>8} core {} pid {:>3} irq {}".format(tickNbr, core, pid, IRQ_TYPES[code])
+        return "{:>8} core {} runs pid {}".format(tickNbr, core, pid)
+
+    def close(self):
+        if getattr(self, '_data', None) is not None:
+            self._data.release()
+            self._data = None
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+##
+##  MAIN
+##  python bintrace.py trace.bin [first [count]]
+##
+if __name__ == '__main__':
+    with BinaryTraceReader(sys.argv[1]) as reader:
+        first = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+        count = int(sys.argv[3]) if len(sys.argv) > 3 else len(reader) - first
+        print("{} records".format(len(reader)))
+        for index in range(first, min(first + count, len(reader))):
+            print(reader.describe(index))
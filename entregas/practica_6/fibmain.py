@@ -14,8 +14,9 @@ if __name__ == '__main__':
     log.logger.info('Starting emulator')
 
     ## setup our hardware and set memory size to 32 "cells"
-    HARDWARE.setup(32)
-    HARDWARE.timeUnit = 0.01
+    hardware = Hardware()
+    hardware.setup(32)
+    hardware.timeUnit = 0.01
 
     SCHEDULER_FCFS = 'FCFS'
     SCHEDULER_RR = 'RR'
@@ -29,7 +30,7 @@ if __name__ == '__main__':
         sche = sys.argv[1]
 
     if sche == SCHEDULER_RR:
-        timer = HARDWARE.timer
+        timer = hardware.timer
         timer.quantum = 2
         scheduler = SchedulerRRB()
     if sche == SCHEDULER_FCFS:
@@ -43,13 +44,13 @@ if __name__ == '__main__':
 
 
     ## Switch on computer
-    HARDWARE.switchOn()
+    hardware.switchOn()
     ## Switch OFF to test
-    HARDWARE.switchOff()
+    hardware.switchOff()
 
     ## new create the Operative System Kernel
     # "booteamos" el sistema operativo
-    kernel = Kernel(HARDWARE,scheduler, frameSize = 4)
+    kernel = Kernel(hardware,scheduler, frameSize = 4)
     # sleep(1)
 
     # Ahora vamos a intentar ejecutar 3 programas a la vez
@@ -138,7 +139,7 @@ if __name__ == '__main__':
     #kernel.run("/prg1",0)
     #kernel.run("/prg2",0)
     #kernel.run("/prg3",2)
-    #sleep(32 * HARDWARE.timeUnit)
+    #sleep(32 * hardware.timeUnit)
     #kernel.run("/prg1",1)
     #kernel.run("/prg2",0)
     #kernel.run("/prg3",0)
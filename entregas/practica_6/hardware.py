@@ -3,6 +3,10 @@
 from tabulate import tabulate
 from time import sleep
 from threading import Thread, Lock
+from collections import OrderedDict
+from string import Formatter
+from array import array
+import heapq
 import log
 
 ##  Estas son la instrucciones soportadas por nuestro CPU
@@ -28,6 +32,72 @@ INSTRUCTION_POPB = 'POPB'
 INSTRUCTION_EXIT = 'EXIT'
 INSTRUCTION_IO = 'IO'
 INSTRUCTION_CPU = 'CPU'
+INSTRUCTION_REP = 'REP'
+
+## Opcodes del flujo de instrucciones pre-decodificado
+## (el orden es el de la tabla de despacho de Cpu)
+OPCODES = [
+    # one operand instructions
+    INSTRUCTION_JNZ,
+    INSTRUCTION_JZ,
+    INSTRUCTION_JMP,
+    INSTRUCTION_CALL,
+    INSTRUCTION_STORA,
+    INSTRUCTION_STORB,
+    INSTRUCTION_REP,
+    # raise an interruption
+    INSTRUCTION_IO,
+    INSTRUCTION_EXIT,
+    # zero operand instructions
+    INSTRUCTION_CPU,
+    INSTRUCTION_RET,
+    INSTRUCTION_DECA,
+    INSTRUCTION_INCA,
+    INSTRUCTION_INCB,
+    INSTRUCTION_DECB,
+    INSTRUCTION_ADDAB,
+    INSTRUCTION_CMPAB,
+    INSTRUCTION_PUSHA,
+    INSTRUCTION_POPA,
+    INSTRUCTION_PUSHB,
+    INSTRUCTION_POPB,
+    ]
+OPCODE = {instr: code for (code, instr) in enumerate(OPCODES)}
+OPCODE_LAST_OOI = OPCODE[INSTRUCTION_REP]
+OPCODE_EXIT = OPCODE[INSTRUCTION_EXIT]
+# instrucciones desconocidas se ejecutan como NOOP (igual que CPU)
+OPCODE_NOOP = OPCODE[INSTRUCTION_CPU]
+
+# instrucciones de un operando
+ONE_OPERAND_INSTRUCTIONS = frozenset([
+    INSTRUCTION_JNZ,
+    INSTRUCTION_JZ,
+    INSTRUCTION_JMP,
+    INSTRUCTION_CALL,
+    INSTRUCTION_STORA,
+    INSTRUCTION_STORB,
+    INSTRUCTION_REP,
+    ])
+
+# instrucciones cuyo operando es una direccion de codigo
+JUMP_INSTRUCTIONS = frozenset([
+    INSTRUCTION_JNZ,
+    INSTRUCTION_JZ,
+    INSTRUCTION_JMP,
+    INSTRUCTION_CALL,
+    ])
+
+# instrucciones que REP puede repetir (sin operando ni interrupcion)
+REPEATABLE_INSTRUCTIONS = frozenset([
+    INSTRUCTION_CPU,
+    INSTRUCTION_DECA,
+    INSTRUCTION_INCA,
+    INSTRUCTION_INCB,
+    INSTRUCTION_DECB,
+    ])
+
+# las corridas mas cortas quedan como estan (REP ocupa 3 celdas)
+REP_MIN_COUNT = 4
 
 ## Helper for emulated machine code
 class ASM():
@@ -156,6 +226,11 @@ class ASM():
     def CPU(self, times):
         return self.__afterCount([INSTRUCTION_CPU] * times)
 
+    # instruction repeated times ticks (see peephole)
+    @classmethod
+    def REP(self, times, instruction):
+        return self.__afterCount([INSTRUCTION_REP, str(times), instruction])
+
     @classmethod
     def isEXIT(self, instruction):
         return INSTRUCTION_EXIT == instruction
@@ -168,6 +243,96 @@ class ASM():
     def isIO(self, instruction):
         return INSTRUCTION_IO == instruction
 
+    ## peephole optimizer over an assembled code (before secondPass)
+    ## - runs of a repeatable instruction become REP count instruction
+    ##   (same ticks, 3 cells instead of count)
+    ## - a run of EXIT becomes a single EXIT
+    ## runs are split at jump targets (labels or absolute addresses) and
+    ## the jump operands are relocated to the new addresses
+    @classmethod
+    def peephole(self, code):
+        targets = set()
+        addr = 0
+        while addr < len(code):
+            if code[addr] in JUMP_INSTRUCTIONS and addr + 1 < len(code):
+                target = self.__jumpTarget(code[addr + 1])
+                if target is not None:
+                    targets.add(target)
+            addr += 2 if code[addr] in ONE_OPERAND_INSTRUCTIONS else 1
+
+        optimized = []
+        newAddr = dict()  # old address -> new address
+        jumps = []        # (index in optimized, old target)
+        addr = 0
+        while addr < len(code):
+            instruction = code[addr]
+            end = addr + 1
+            if instruction in REPEATABLE_INSTRUCTIONS or self.isEXIT(instruction):
+                while end < len(code) and code[end] == instruction and end not in targets:
+                    end += 1
+            elif instruction in ONE_OPERAND_INSTRUCTIONS and end < len(code):
+                if instruction in JUMP_INSTRUCTIONS:
+                    jumps.append((len(optimized) + 1, self.__jumpTarget(code[end])))
+                # a REP keeps its repeated instruction
+                end += 2 if instruction == INSTRUCTION_REP else 1
+            count = end - addr
+            if self.isEXIT(instruction) or instruction in REPEATABLE_INSTRUCTIONS and count >= REP_MIN_COUNT:
+                for old in range(addr, end):
+                    newAddr[old] = len(optimized)
+                if self.isEXIT(instruction):
+                    optimized.append(instruction)
+                else:
+                    optimized.extend([INSTRUCTION_REP, str(count), instruction])
+            else:
+                for old in range(addr, end):
+                    newAddr[old] = len(optimized) + old - addr
+                optimized.extend(code[addr:end])
+            addr = end
+        newAddr[len(code)] = len(optimized)
+
+        for (index, target) in jumps:
+            if target in newAddr:
+                optimized[index] = str(newAddr[target])
+        return optimized
+
+    # code address of a jump operand (a label or a number), None if unknown
+    @classmethod
+    def __jumpTarget(self, operand):
+        try:
+            return int(self.__addrInTable(operand))
+        except (TypeError, ValueError):
+            return None
+
+    # decode one instruction into (opcode, operand, instruction)
+    # operand is an int already parsed, or None
+    @classmethod
+    def decodeOne(self, instruction, operand = None):
+        opcode = OPCODE.get(instruction, OPCODE_NOOP) \
+                if isinstance(instruction, str) else OPCODE_NOOP
+        if operand is not None:
+            try:
+                operand = int(operand)
+            except (TypeError, ValueError):
+                operand = None
+        return (opcode, operand, instruction)
+
+    # pre-decode an assembled code, returns a list parallel to code
+    # with a decoded tuple in every instruction cell and None
+    # in operand cells
+    @classmethod
+    def decode(self, code):
+        decoded = [None] * len(code)
+        addr = 0
+        while addr < len(code):
+            instruction = code[addr]
+            if instruction in ONE_OPERAND_INSTRUCTIONS and addr + 1 < len(code):
+                decoded[addr] = self.decodeOne(instruction, code[addr + 1])
+                addr += 2
+            else:
+                decoded[addr] = self.decodeOne(instruction)
+                addr += 1
+        return decoded
+
 
 
 ##  Estas son la interrupciones soportadas por nuestro Kernel
@@ -177,18 +342,62 @@ IO_OUT_INTERRUPTION_TYPE     = "#IO_OUT"
 NEW_INTERRUPTION_TYPE        = "#NEW"
 TIMEOUT_INTERRUPTION_TYPE    = "#TIMEOUT"
 PAGE_FAULT_INTERRUPTION_TYPE = "#PAGE_FAULT"
+RELEASE_INTERRUPTION_TYPE    = "#RELEASE"
+
+## trace events (see Tracer), with the format of their arguments
+TRACE_TICK       = 0
+TRACE_TICKS      = 1
+TRACE_EXEC       = 2
+TRACE_BLOCK      = 3
+TRACE_NOOP       = 4
+TRACE_IRQ        = 5
+TRACE_SWITCH     = 6
+TRACE_PAGE_FAULT = 7
+TRACE_DEVICE     = 8
+
+TRACE_FORMAT = {
+    TRACE_TICK:       "--------------- tick ---------------",
+    TRACE_TICKS:      "--------------- ticks: {0}..{1} ---------------",
+    TRACE_EXEC:       "cpu {0} - Exec: {1:<6} {2:<3}, PC={3:>3} A={4:>3} B={5:>3} SP={6:>3} zflag={7}",
+    TRACE_BLOCK:      "cpu {0} - Block: {1:>3} ticks from {2:>3}, PC={3:>3} A={4:>3} B={5:>3} SP={6:>3} zflag={7}",
+    TRACE_NOOP:       "cpu {0} - NOOP",
+    TRACE_IRQ:        "Handling {0} irq with parameters = {1} (core {2})",
+    TRACE_SWITCH:     "dispacher - core {0} runs pid {1}",
+    TRACE_PAGE_FAULT: "mmu {0} - page fault: page {1}",
+    TRACE_DEVICE:     "device {0} - Busy: {1} of {2}",
+    }
+
+## number of arguments of each kind of trace event
+TRACE_ARITY = {kind: len({field for (text, field, spec, conversion) in Formatter().parse(form) if field})
+               for (kind, form) in TRACE_FORMAT.items()}
+TRACE_ARGUMENTS = max(TRACE_ARITY.values())
+
+## the plain value traced for the parameters of an irq: the trace must not
+## keep live objects (a pcb is traced by its pid, a new program by its name)
+def traceValue(parameters):
+    if isinstance(parameters, tuple):
+        return traceValue(parameters[0])
+    pid = getattr(parameters, 'pid', None)
+    if pid is not None:
+        return "pid {}".format(pid)
+    return parameters
 
 ## emulates an Interrupt request
 class IRQ:
 
-    def __init__(self, type, parameters = None):
+    def __init__(self, type, parameters = None, core = None):
         self._type = type
         self._parameters = parameters
+        self._core = core # core that raised it (None: not raised by a core)
 
     @property
     def parameters(self):
         return self._parameters
 
+    @property
+    def core(self):
+        return self._core
+
     @property
     def type(self):
         return self._type
@@ -198,27 +407,202 @@ class IRQ:
 ## emulates the Interrupt Vector Table
 class InterruptVector():
 
-    def __init__(self):
+    def __init__(self, tracer):
         self._handlers = dict()
+        self._tracer = tracer
+        self._binaryTrace = None
         self.lock = Lock()
 
+    # writer of the binary execution trace (None: not traced)
+    @property
+    def binaryTrace(self):
+        return self._binaryTrace
+
+    @binaryTrace.setter
+    def binaryTrace(self, writer):
+        self._binaryTrace = writer
+
     def register(self, interruptionType, interruptionHandler):
         self._handlers[interruptionType] = interruptionHandler
 
     def handle(self, irq):
-        log.logger.info("Handling {type} irq with parameters = {parameters}".format(type=irq.type, parameters=irq.parameters ))
+        if self._tracer.on:
+            self._tracer.record(TRACE_IRQ, irq.type, traceValue(irq.parameters), irq.core)
+        if self._binaryTrace is not None:
+            self._binaryTrace.interruption(self._tracer.now, irq)
         self.lock.acquire()
         self._handlers[irq.type].execute(irq)
         self.lock.release()
 
 
+## emulates a discrete event queue: ticks at which some component has
+## an event (device completion, quantum expiry) ordered in a heap.
+## An event only says "this tick must be notified to every subscriber",
+## the component detects the event itself in its tick().
+## The cpu does not schedule: its events (IO, EXIT, a missing page) are
+## only known when it gets to the instruction, so a burst stops before
+## it and the clock notifies that tick (see Timer.burst)
+class EventQueue():
+
+    def __init__(self):
+        self._heap = [] # [tick, order, live]
+        self._order = 0 # fifo between events of the same tick
+        self._live = 0
+        self._current = -1 # tick being executed (or last executed)
+
+    @property
+    def current(self):
+        return self._current
+
+    @current.setter
+    def current(self, tickNbr):
+        self._current = tickNbr
+
+    # an event within ticks ticks from the current one, returns
+    # the event (to cancel it)
+    def schedule(self, ticks):
+        self._order += 1
+        event = [self._current + ticks, self._order, True]
+        heapq.heappush(self._heap, event)
+        self._live += 1
+        return event
+
+    # the event will not wake the clock (it stays in the heap until it
+    # gets to the top)
+    def cancel(self, event):
+        if event[2]:
+            event[2] = False
+            self._live -= 1
+
+    def __dropCancelled(self):
+        while self._heap and not self._heap[0][2]:
+            heapq.heappop(self._heap)
+
+    # tick of the next event (inf if there are no events)
+    def nextTick(self):
+        self.__dropCancelled()
+        if self._heap:
+            return self._heap[0][0]
+        return float('inf')
+
+    # forget events up to tickNbr (already notified)
+    def discardUntil(self, tickNbr):
+        self.__dropCancelled()
+        while self._heap and self._heap[0][0] <= tickNbr:
+            self.cancel(heapq.heappop(self._heap))
+            self.__dropCancelled()
+
+    def __len__(self):
+        return self._live
+
+    def __repr__(self):
+        return "EventQueue(current={} next={})".format(self._current,
+                sorted(tick for (tick, order, live) in self._heap if live)[:8])
+
+
+## keeps the last size trace events in a preallocated ring buffer of
+## parallel slots (tick, kind and a column per argument): recording an
+## event allocates nothing and nothing is formatted until the buffer is
+## dumped (see TRACE_FORMAT). It is off unless turned on (shell trace on)
+class Tracer():
+
+    def __init__(self, size = 4096, on = False):
+        self._size = size
+        self._on = on
+        self._now = 0    # tick of the events recorded
+        self.clear()
+
+    @property
+    def on(self):
+        return self._on
+
+    @on.setter
+    def on(self, value):
+        self._on = value
+
+    @property
+    def now(self):
+        return self._now
+
+    @now.setter
+    def now(self, tickNbr):
+        self._now = tickNbr
+
+    @property
+    def size(self):
+        return self._size
+
+    def record(self, kind, a0 = None, a1 = None, a2 = None, a3 = None,
+               a4 = None, a5 = None, a6 = None, a7 = None):
+        slot = self._count % self._size
+        self._ticks[slot] = self._now
+        self._kinds[slot] = kind
+        columns = self._arguments
+        columns[0][slot] = a0
+        columns[1][slot] = a1
+        columns[2][slot] = a2
+        columns[3][slot] = a3
+        columns[4][slot] = a4
+        columns[5][slot] = a5
+        columns[6][slot] = a6
+        columns[7][slot] = a7
+        self._count += 1
+
+    def clear(self):
+        self._ticks = array('q', [0]) * self._size
+        self._kinds = bytearray(self._size)
+        self._arguments = [[None] * self._size for column in range(TRACE_ARGUMENTS)]
+        self._count = 0  # events recorded (only the last size are kept)
+
+    # the last count events (all the kept ones if None), oldest first,
+    # as tuples (tick, kind, arguments)
+    def events(self, count = None):
+        kept = min(self._count, self._size)
+        if count is None or count > kept:
+            count = kept
+        events = []
+        for i in range(self._count - count, self._count):
+            slot = i % self._size
+            kind = self._kinds[slot]
+            arguments = tuple(column[slot] for column in self._arguments[:TRACE_ARITY[kind]])
+            events.append((self._ticks[slot], kind, arguments))
+        return events
+
+    def dump(self, count = None):
+        return ["{:>6} {}".format(tickNbr, TRACE_FORMAT[kind].format(*arguments))
+                for (tickNbr, kind, arguments) in self.events(count)]
+
+    def __repr__(self):
+        return "\n".join(self.dump())
+
+
 ## emulates the Internal Clock
 class Clock():
 
-    def __init__(self):
+    def __init__(self, tracer):
         self._subscribers = []
+        self._tracer = tracer
         self._running = False
         self._timeUnit = 1
+        self._runner = None
+        self._fastForward = False
+        self._events = EventQueue()
+        self._nextTick = 0 # next tick to run, whoever runs it (monotonic)
+        self._currentTick = 0 # tick being run (the next one between ticks)
+
+    @property
+    def events(self):
+        return self._events
+
+    # next tick to run (any mode)
+    @property
+    def now(self):
+        return self._nextTick
+
+    # tick being run, or the next one between ticks (any mode)
+    @property
+    def currentTick(self):
+        return self._currentTick
 
     @property
     def tickUnitInSec(self):
@@ -228,6 +612,27 @@ class Clock():
     def tickUnitInSec(self, value):
         self._timeUnit = value
 
+    # subscriber that can run several cpu ticks at once (the Timer)
+    # None: every tick is notified to every subscriber
+    @property
+    def runner(self):
+        return self._runner
+
+    @runner.setter
+    def runner(self, runner):
+        self._runner = runner
+
+    # True: the runner runs the cpu until the next event (IO/EXIT
+    # instruction, quantum expiry, device completion) in one tick call
+    # False: it runs a single compiled block
+    @property
+    def fastForward(self):
+        return self._fastForward
+
+    @fastForward.setter
+    def fastForward(self, value):
+        self._fastForward = value
+
     def addSubscriber(self, subscriber):
         self._subscribers.append(subscriber)
 
@@ -241,23 +646,125 @@ class Clock():
         t.start()
 
     def __start(self):
-        tickNbr = 0
         while (self._running):
-            self.tick(tickNbr)
-            tickNbr += 1
-
-    def tick(self, tickNbr):
-        log.logger.info("        --------------- tick: {tickNbr} ---------------".format(tickNbr = tickNbr))
+            self.tick()
+
+    # runs the next tick, returns the number of ticks elapsed (more than
+    # one, up to maxTicks, if the runner ran several cpu ticks)
+    def tick(self, maxTicks = float('inf')):
+        tickNbr = self._nextTick
+        count = self.__burst(tickNbr, maxTicks)
+        if count > 0:
+            self.__skip(tickNbr, count, self._runner)
+            self._nextTick += count
+            sleep(self._timeUnit if self._fastForward else self._timeUnit * count)
+            return count
+
+        self.__notify(tickNbr)
+        self._nextTick += 1
+        ## wait 1 second and keep looping
+        sleep(self._timeUnit)
+        return 1
+
+    def __notify(self, tickNbr):
+        self._tracer.now = tickNbr
+        if self._tracer.on:
+            self._tracer.record(TRACE_TICK)
+        self._events.current = tickNbr
+        self._currentTick = tickNbr
         ## notify all subscriber that a new clock cycle has started
         for subscriber in self._subscribers:
             subscriber.tick(tickNbr)
-        ## wait 1 second and keep looping
-        sleep(self._timeUnit)
+        self._currentTick = tickNbr + 1
+        self._events.discardUntil(tickNbr)
+
+    ## the subscribers (but the one that ran them) skip count ticks
+    def __skip(self, tickNbr, count, runner = None):
+        self._tracer.now = tickNbr
+        if self._tracer.on:
+            self._tracer.record(TRACE_TICKS, tickNbr, tickNbr + count - 1)
+        # what the subscribers record happens in the last tick skipped
+        self._tracer.now = tickNbr + count - 1
+        for subscriber in self._subscribers:
+            if subscriber is not runner:
+                subscriber.skipTicks(tickNbr, count)
+        self._events.current = tickNbr + count - 1
+        self._currentTick = tickNbr + count
+
+    ## discrete event simulation (headless, no sleeps, no thread)
+    ## runs ticks from now up to (not including) untilTick.
+    ## Only ticks with an event (or an interruption raised by the cpu) are
+    ## notified to every subscriber, the cpu runs in bursts up to the next
+    ## event and idle periods are skipped at once
+    def runUntil(self, untilTick):
+        while self._nextTick < untilTick:
+            self.__advance(untilTick)
+
+    # run until the cpu is idle and no subscriber is waiting for an event
+    # (or maxTicks more ticks run). Returns the ticks run
+    def runUntilIdle(self, maxTicks = float('inf')):
+        start = self._nextTick
+        while self._nextTick - start < maxTicks and not self.__isIdle():
+            self.__advance(start + maxTicks)
+        return self._nextTick - start
+
+    # run the next event (or cpu burst, or idle period)
+    def __advance(self, untilTick):
+        now = self._nextTick
+        self._events.discardUntil(now - 1)
+        wake = min(self._events.nextTick(), untilTick)
+        count = 0
+        if self.__canSkip() and wake > now:
+            count = self._runner.burst(now, wake - now, True)
+            if count > 0:
+                self.__skip(now, count, self._runner)
+            elif self._runner.isIdle() and wake != float('inf'):
+                ## nothing to do until the next event
+                count = wake - now
+                self.__skip(now, count)
+        if count == 0:
+            self.__notify(now)
+            count = 1
+        self._nextTick += count
+
+    def __canSkip(self):
+        if self._runner is None:
+            return False
+        for subscriber in self._subscribers:
+            if not hasattr(subscriber, 'skipTicks'):
+                return False
+        return True
+
+    def __isIdle(self):
+        if self._runner is None or not self._runner.isIdle():
+            return False
+        for subscriber in self._subscribers:
+            if subscriber is not self._runner and subscriber.quietTicks() != float('inf'):
+                return False
+        return True
+
+    # let the runner run the cpu for ticks in which no subscriber has
+    # an event, returns the number of ticks run (0: do a normal tick)
+    # Subscribers tell how many ticks they can skip without an event
+    # with quietTicks() and skip them with skipTicks()
+    def __burst(self, tickNbr, maxTicks):
+        if self._runner is None:
+            return 0
+        self._tracer.now = tickNbr
+        quiet = maxTicks
+        for subscriber in self._subscribers:
+            if not hasattr(subscriber, 'quietTicks'):
+                return 0
+            quiet = min(quiet, subscriber.quietTicks())
+        if quiet < 2:
+            return 0
+        return self._runner.burst(tickNbr, quiet, self._fastForward)
 
     def do_ticks(self, times):
         log.logger.info("---- :::: CLOCK do_ticks: {times} ::: -----".format(times=times))
-        for tickNbr in range(0, times):
-            self.tick(tickNbr)
+        count = 0
+        while count < times:
+            count += self.tick(times - count)
 
 
 ## emulates the main memory (RAM)
@@ -266,13 +773,29 @@ class Memory():
     def __init__(self, size):
         self._size = size
         self._cells = [''] * size
+        # pre-decoded instruction cache, parallel to _cells
+        self._decoded = [None] * size
 
-    def put(self, addr, value):
+    def put(self, addr, value, decoded = None):
         self._cells[addr] = value
+        self._decoded[addr] = decoded
 
     def get(self, addr):
         return self._cells[addr]
 
+    def getDecoded(self, addr):
+        return self._decoded[addr]
+
+    def putDecoded(self, addr, decoded):
+        self._decoded[addr] = decoded
+
+    # a data write invalidates the cell and the previous one
+    # (it may be an instruction whose operand is this cell)
+    def invalidate(self, addr):
+        self._decoded[addr] = None
+        if addr > 0:
+            self._decoded[addr - 1] = None
+
     def __repr__(self):
         return tabulate(enumerate(self._cells), tablefmt='psql')
 
@@ -280,14 +803,354 @@ class Memory():
         return  self._size
         ## return "Memoria = {mem}".format(mem=self._cells)
 
+## emulated instruction compiled inside a basic block
+## each entry is the python source for the instruction
+## (registers are kept in locals ac, bc, zf)
+BLOCK_SOURCE = {
+    INSTRUCTION_CPU:   "pass",
+    INSTRUCTION_STORA: "ac = {op}",
+    INSTRUCTION_STORB: "bc = {op}",
+    INSTRUCTION_DECA:  "ac -= 1; zf = ac == 0",
+    INSTRUCTION_INCA:  "ac += 1; zf = ac == 0",
+    INSTRUCTION_INCB:  "bc += 1; zf = bc == 0",
+    INSTRUCTION_DECB:  "bc -= 1; zf = bc == 0",
+    INSTRUCTION_ADDAB: "ac += bc; zf = ac == 0",
+    INSTRUCTION_CMPAB: "zf = ac == bc",
+    }
+
+## jumps end a basic block
+BLOCK_JUMPS = {
+    INSTRUCTION_JMP: "{op}",
+    INSTRUCTION_JZ:  "{op} if zf else {next}",
+    INSTRUCTION_JNZ: "{next} if zf else {op}",
+    }
+
+
+## a compiled basic block: run(cpu) executes all its instructions
+class Block():
+
+    def __init__(self, start, run, ticks, pages, translations):
+        self._start = start
+        self._run = run
+        self._ticks = ticks
+        self._pages = pages
+        self._translations = translations
+
+    @property
+    def start(self):
+        return self._start
+
+    @property
+    def ticks(self):
+        return self._ticks
+
+    @property
+    def pages(self):
+        return self._pages
+
+    # logical addresses whose fetch translates when run one tick at a time
+    # (the start and the first address of every other page)
+    @property
+    def translations(self):
+        return self._translations
+
+    def run(self, cpu):
+        self._run(cpu)
+
+    def __repr__(self):
+        return "Block(start={} ticks={} pages={})".format(self._start, self._ticks, self._pages)
+
+
+## compiles straight runs of register-only instructions (ended by a jump)
+## into python functions, cached by (addressSpace, start address).
+## CALL/RET/PUSH/POP (stack memory) and IO/EXIT (interruptions) are left
+## to Cpu.tick, so a block never page faults nor raises an IRQ
+class BlockCompiler():
+
+    def __init__(self, mmu):
+        self._mmu = mmu
+        self._blocks = dict()      # (space, start) -> Block or None
+        self._pageBlocks = dict()  # (space, pageId) -> set of start
+
+    def reset(self):
+        self._blocks = dict()
+        self._pageBlocks = dict()
+
+    # drop every block that uses page pageId of space
+    def invalidate(self, space, pageId):
+        starts = self._pageBlocks.pop((space, pageId), None)
+        if starts:
+            for start in starts:
+                self._blocks.pop((space, start), None)
+
+    # the block starting at address pc (None if there is no block)
+    # the block is only usable while all of its pages are mapped and clean
+    def lookup(self, pc):
+        space = self._mmu.addressSpace
+        if space is None:
+            return None
+        key = (space, pc)
+        if key in self._blocks:
+            block = self._blocks[key]
+        else:
+            block = self._compile(pc)
+            self._blocks[key] = block
+            if block:
+                for pageId in block.pages:
+                    self._pageBlocks.setdefault((space, pageId), set()).add(pc)
+        if block is None:
+            return None
+        for pageId in block.pages:
+            page = self._mmu.probePage(pageId)
+            if page is None or not page.isValid or page.dirty:
+                return None
+        for pageId in block.pages:
+            self._mmu.probePage(pageId).chance = 1
+        return block
+
+    # instruction and operand at logical address addr (None if unmapped)
+    def _read(self, addr):
+        frameSize = self._mmu.frameSize
+        if addr > self._mmu.limit:
+            return None
+        page = self._mmu.probePage(addr // frameSize)
+        if page is None or not page.isValid or page.dirty:
+            return None
+        return self._mmu.memory.get(page.frame * frameSize + addr % frameSize)
+
+    def _compile(self, start):
+        frameSize = self._mmu.frameSize
+        lines = []
+        pages = []
+        addr = start
+        ir, opr, nextPc = None, None, start
+        while True:
+            instruction = self._read(addr)
+            if instruction is None:
+                break
+            operand = None
+            size = 1
+            if instruction in ONE_OPERAND_INSTRUCTIONS:
+                operand = self._read(addr + 1)
+                try:
+                    operand = int(operand)
+                except (TypeError, ValueError):
+                    break
+                size = 2
+            if instruction in BLOCK_SOURCE:
+                lines.append(BLOCK_SOURCE[instruction].format(op = operand))
+            elif instruction in BLOCK_JUMPS:
+                lines.append("cpu._pc = " + BLOCK_JUMPS[instruction].format(op = operand, next = addr + size))
+            else:
+                break
+            for pageId in {addr // frameSize, (addr + size - 1) // frameSize}:
+                if pageId not in pages:
+                    pages.append(pageId)
+            ir, opr = instruction, operand
+            addr += size
+            nextPc = addr
+            if instruction in BLOCK_JUMPS:
+                break
+
+        ticks = len(lines)
+        if ticks < 2:
+            return None
+
+        if ir not in BLOCK_JUMPS:
+            lines.append("cpu._pc = {}".format(nextPc))
+        source = "def block(cpu):\n    ac = cpu._ac; bc = cpu._bc; zf = cpu._zf\n"
+        for line in lines:
+            source += "    " + line + "\n"
+        source += "    cpu._ac = ac; cpu._bc = bc; cpu._zf = zf\n"
+        source += "    cpu._ir = {!r}; cpu._or = {!r}\n".format(ir, opr)
+        namespace = dict()
+        exec(compile(source, "<block {}>".format(start), "exec"), namespace)
+        translations = [addr for addr in range(start, nextPc) if addr == start or addr % frameSize == 0]
+        return Block(start, namespace['block'], ticks, pages, translations)
+
+
 ## emulates the Memory Management Unit (MMU)
+## default size of the TLB of each core
+TLB_ENTRIES = 64
+TLB_WAYS = 4
+
+
+## set associative TLB tagged with the address space id (the pid), so the
+## entries of a process survive the context switches. Each set is kept
+## in LRU order. The entries point to the page table entries: their
+## valid bit is checked on every access, an evicted page faults
+class TLB():
+
+    def __init__(self, entries = TLB_ENTRIES, ways = TLB_WAYS):
+        if entries < ways or entries % ways != 0:
+            raise Exception("TLB of {} entries can not have {} ways".format(entries, ways))
+        self._ways = ways
+        self._sets = [OrderedDict() for _ in range(entries // ways)]
+        self.clearStats()
+
+    @property
+    def entries(self):
+        return self._ways * len(self._sets)
+
+    @property
+    def ways(self):
+        return self._ways
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    @property
+    def flushes(self):
+        return self._flushes
+
+    def clearStats(self):
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._flushes = 0
+
+    def _set(self, asid, pageId):
+        return self._sets[(pageId ^ asid) % len(self._sets)]
+
+    # the entry of pageId of asid (None: miss)
+    def lookup(self, asid, pageId):
+        entries = self._set(asid, pageId)
+        page = entries.get((asid, pageId))
+        if page is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+            entries.move_to_end((asid, pageId))
+        return page
+
+    # evicts the least recently used entry of the set if it is full
+    def insert(self, asid, pageId, page):
+        entries = self._set(asid, pageId)
+        if (asid, pageId) not in entries and len(entries) >= self._ways:
+            entries.popitem(last = False)
+            self._evictions += 1
+        entries[(asid, pageId)] = page
+        entries.move_to_end((asid, pageId))
+
+    def flush(self):
+        for entries in self._sets:
+            entries.clear()
+        self._flushes += 1
+
+    # drops the entries of an address space (a finished process)
+    def flushAsid(self, asid):
+        for entries in self._sets:
+            for key in [key for key in entries if key[0] == asid]:
+                del entries[key]
+        self._flushes += 1
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._sets)
+
+    def __repr__(self):
+        lookups = self._hits + self._misses
+        return "TLB {} entries ({} ways, {} used): {} hits {} misses ({:.1%} hits) {} evictions {} flushes".format(
+                self.entries, self._ways, len(self), self._hits, self._misses,
+                self._hits / lookups if lookups else 0, self._evictions, self._flushes)
+
+
 class MMU():
 
-    def __init__(self, memory):
+    def __init__(self, memory, interruptVector, tracer, coreId = 0, tlbEntries = TLB_ENTRIES, tlbWays = TLB_WAYS):
         self._memory = memory
+        self._interruptVector = interruptVector
+        self._tracer = tracer
+        self._coreId = coreId
         self._frameSize = 0
         self._limit = 999
-        self._tlb = dict()
+        self._tlb = TLB(tlbEntries, tlbWays)
+        self._asid = None # address space (pid) running
+        self._pageTableBase = None # page table of the running process
+        # last translation: logical addresses [memoStart, memoEnd) are at
+        # memoBase + address (see logicalToPhysicalAddress)
+        self._memoStart = 0
+        self._memoEnd = 0
+        self._memoBase = 0
+        self._addressSpace = None # program mapped by the dispacher
+        self._compiler = BlockCompiler(self)
+        self._pageFaults = 0 # page faults raised by this mmu
+
+    @property
+    def memory(self):
+        return self._memory
+
+    @property
+    def pageFaults(self):
+        return self._pageFaults
+
+    @property
+    def addressSpace(self):
+        return self._addressSpace
+
+    @addressSpace.setter
+    def addressSpace(self, space):
+        self._addressSpace = space
+
+    @property
+    def compiler(self):
+        return self._compiler
+
+    @property
+    def tlb(self):
+        return self._tlb
+
+    @property
+    def asid(self):
+        return self._asid
+
+    @asid.setter
+    def asid(self, asid):
+        self._asid = asid
+        self.forgetTranslation()
+
+    # page table base register: the page table (owned by the kernel)
+    # of the running process, a list of pages by page number
+    @property
+    def pageTableBase(self):
+        return self._pageTableBase
+
+    @pageTableBase.setter
+    def pageTableBase(self, pageTable):
+        self._pageTableBase = pageTable
+        self.forgetTranslation()
+
+    # a page was evicted (or its reference bit cleared): translate again
+    def forgetTranslation(self):
+        self._memoStart = 0
+        self._memoEnd = 0
+
+    # page table entry of pageId or None: from the TLB or, on a miss,
+    # from the page table at the base register (cached in the TLB)
+    def getPage(self, pageId):
+        page = self._tlb.lookup(self._asid, pageId)
+        if page is None:
+            pageTable = self._pageTableBase
+            if pageTable is not None and 0 <= pageId < len(pageTable):
+                page = pageTable[pageId]
+                self._tlb.insert(self._asid, pageId, page)
+        return page
+
+    # the page pageId of the page table (None if unmapped) without a
+    # translation: neither the TLB nor its counters are touched
+    def probePage(self, pageId):
+        pageTable = self._pageTableBase
+        if pageTable is not None and 0 <= pageId < len(pageTable):
+            return pageTable[pageId]
+        return None
 
     @property
     def limit(self):
@@ -296,6 +1159,7 @@ class MMU():
     @limit.setter
     def limit(self, limit):
         self._limit = limit
+        self.forgetTranslation()
 
     @property
     def frameSize(self):
@@ -304,37 +1168,39 @@ class MMU():
     @frameSize.setter
     def frameSize(self, frameSize):
         self._frameSize = frameSize
+        self.forgetTranslation()
 
     def updateTLB(self, pageNumber, page):
-        self._tlb.update({pageNumber: page})
-        #print(self._tlb)
-
-    @property    
-    def getPages(self):
-        return list(self._tlb.values())
+        self._tlb.insert(self._asid, pageNumber, page)
 
     def resetTLB(self):
-        self._tlb = dict()
-
-    def setPageFrame(self, pageId, frameId):
-        self._tlb[pageId] = frameId
+        self._tlb.flush()
+        self.forgetTranslation()
 
+    # fast path: an address of the page of the last translation
     def logicalToPhysicalAddress(self, logicalAddress):
+        if self._memoStart <= logicalAddress < self._memoEnd:
+            return self._memoBase + logicalAddress
+        return self._translate(logicalAddress)
+
+    def _translate(self, logicalAddress):
         if (logicalAddress > self._limit):
             raise Exception("Invalid Address,  {logicalAddress} is higher than process limit: {limit}".format(limit = self._limit, logicalAddress = logicalAddress))
 
         pageId = logicalAddress // self._frameSize
         offset = logicalAddress % self._frameSize
         # buscamos la direccion Base del frame donde esta almacenada la pagina
-        try:
-            page = self._tlb[pageId]
-        except:
+        page = self.getPage(pageId)
+        if page is None:
             raise Exception("\n*\n* ERROR \n*\n Error en el MMU\nNo se cargo la pagina  {pageId}".format(pageId = str(pageId)))
 
         if not page.isValid:
-            pageFaultIRQ = IRQ(PAGE_FAULT_INTERRUPTION_TYPE, pageId)
-            HARDWARE.cpu._interruptVector.handle(pageFaultIRQ)
-            page = self._tlb[pageId]
+            self._pageFaults += 1
+            if self._tracer.on:
+                self._tracer.record(TRACE_PAGE_FAULT, self._coreId, pageId)
+            pageFaultIRQ = IRQ(PAGE_FAULT_INTERRUPTION_TYPE, pageId, self._coreId)
+            self._interruptVector.handle(pageFaultIRQ)
+            page = self.getPage(pageId)
             #print(" -----------  DESPUES DE # PAGE_FAULT")
             #print(page)
             #print(" -----------  DESPUES DE # PAGE_FAULT")
@@ -346,21 +1212,41 @@ class MMU():
         frameBaseDir  = self._frameSize * frameId
         physicalAddress = frameBaseDir + offset
 
+        pageStart = logicalAddress - offset
+        self._memoStart = pageStart
+        self._memoEnd = min(pageStart + self._frameSize, self._limit + 1)
+        self._memoBase = frameBaseDir - pageStart
         return physicalAddress
 
     def write(self, logicalAddress, value):
-        self._memory.put(self.logicalToPhysicalAddress(logicalAddress), value)
+        physicalAddress = self.logicalToPhysicalAddress(logicalAddress)
+        self._memory.put(physicalAddress, value)
+        self._memory.invalidate(physicalAddress)
         pageId = logicalAddress // self._frameSize
         #print("----------------------WRiTE PAGE ID ", pageId)
-        page = self._tlb.get(pageId)
+        page = self.probePage(pageId)
         page.dirty = True
-        self._tlb.update({pageId:page})
+        self._compiler.invalidate(self._addressSpace, pageId)
 
 
     def fetch(self,  logicalAddress):
         # obtenemos la instrucción alocada en esa direccion
         return self._memory.get(self.logicalToPhysicalAddress(logicalAddress))
 
+    # fetch the pre-decoded instruction at logicalAddress
+    # decoding (and caching) it if the cell has not been decoded
+    def fetchDecoded(self, logicalAddress):
+        physicalAddress = self.logicalToPhysicalAddress(logicalAddress)
+        decoded = self._memory.getDecoded(physicalAddress)
+        if decoded is None:
+            instruction = self._memory.get(physicalAddress)
+            if instruction in ONE_OPERAND_INSTRUCTIONS:
+                decoded = ASM.decodeOne(instruction, self.fetch(logicalAddress + 1))
+            else:
+                decoded = ASM.decodeOne(instruction)
+            self._memory.putDecoded(physicalAddress, decoded)
+        return decoded
+
     def fetchInstr(self, frameId):
         listInst = []
         number = frameId *self._frameSize
@@ -373,25 +1259,310 @@ class MMU():
 ## emulates the main Central Processor Unit
 class Cpu():
 
-    def __init__(self, mmu, interruptVector):
+    def __init__(self, mmu, interruptVector, tracer, coreId = 0):
         self._mmu = mmu
         self._interruptVector = interruptVector
+        self._tracer = tracer
+        self._coreId = coreId
         self._pc = -1 # program counter
         self._ir = None #instruction register
         self._or = None #
+        self._operand = None # pre-decoded operand (int)
         self._ac = 0    #acumulator?
         self._bc = 0    #
         self._zf = True #zero flag
         self._sp = -1 #stack pointer
+        self._rc = 0 # repetitions left of the current REP (0: none)
+        self._predecoded = True # dispatch pre-decoded opcodes
+        self._blocks = False # run compiled basic blocks (see Clock)
+        self._block = None   # block ready to run at pc
+        self._repeat = 0     # repetitions of the REP at pc ready to run
+        self._binaryTrace = None # writer of every executed instruction
+        self._executed = 0 # instructions executed (a REP repetition is one)
+        # keep in sync with OPCODES
+        self._dispatch = [
+            self._opJNZ,
+            self._opJZ,
+            self._opJMP,
+            self._opCALL,
+            self._opSTORA,
+            self._opSTORB,
+            self._opREP,
+            self._opIO,
+            self._opEXIT,
+            self._opNOOP,   # CPU
+            self._opRET,
+            self._opDECA,
+            self._opINCA,
+            self._opINCB,
+            self._opDECB,
+            self._opADDAB,
+            self._opCMPAB,
+            self._opPUSHA,
+            self._opPOPA,
+            self._opPUSHB,
+            self._opPOPB,
+            ]
+
+    @property
+    def predecoded(self):
+        return self._predecoded
+
+    # False: fetch/decode instruction strings on every tick
+    @predecoded.setter
+    def predecoded(self, value):
+        self._predecoded = value
+
+    @property
+    def blocks(self):
+        return self._blocks
+
+    @blocks.setter
+    def blocks(self, value):
+        self._blocks = value
+        self._block = None
+
+    # traced cpus run one instruction per step (no blocks, no REP bursts)
+    @property
+    def binaryTrace(self):
+        return self._binaryTrace
+
+    @binaryTrace.setter
+    def binaryTrace(self, writer):
+        self._binaryTrace = writer
+
+    # instructions executed, whatever the way they run (tick, block, REP burst)
+    @property
+    def executed(self):
+        return self._executed
+
+    # ticks taken by the next step: a compiled block if it fits in limit,
+    # else one instruction (unless blocksOnly)
+    # 0 if the cpu is idle, the instruction is not in memory or it raises
+    # an interruption (IO, EXIT): that must be a normal tick
+    def stepTicks(self, limit, blocksOnly = False):
+        self._block = None
+        self._repeat = 0
+        if self._pc < 0 or limit < 1:
+            return 0
+        if self._blocks and self._binaryTrace is None:
+            block = self._mmu.compiler.lookup(self._pc)
+            if block is not None and block.ticks <= limit:
+                self._block = block
+                return block.ticks
+        if blocksOnly:
+            return 0
+        frameSize = self._mmu.frameSize
+        page = self._mmu.probePage(self._pc // frameSize)
+        if page is None or not page.isValid:
+            return 0
+        # peek at the memory cell (a fetch could page fault for the operand)
+        instruction = self._mmu.memory.get(page.frame * frameSize + self._pc % frameSize)
+        if ASM.isEXIT(instruction) or ASM.isIO(instruction):
+            return 0
+        if instruction == INSTRUCTION_REP and self._binaryTrace is None:
+            return self._repeatTicks(limit)
+        return 1
+
+    # ticks of the REP at pc that can run at once (1 if its operand or
+    # repeated instruction are not in memory, they may page fault)
+    def _repeatTicks(self, limit):
+        frameSize = self._mmu.frameSize
+        for addr in [self._pc + 1, self._pc + 2]:
+            page = self._mmu.probePage(addr // frameSize)
+            if page is None or not page.isValid:
+                return 1
+        left = self._rc
+        if left == 0:
+            left = int(self._mmu.fetch(self._pc + 1))
+        self._repeat = min(left, limit)
+        return self._repeat
+
+    # run the step measured by stepTicks
+    def step(self, tickNbr):
+        self._tracer.now = tickNbr
+        if self._block is not None:
+            self.runBlock(tickNbr)
+        elif self._repeat > 1:
+            self.runRepeat(tickNbr)
+        else:
+            self.tick(tickNbr)
+
+    # run the repetitions found by stepTicks (one tick each, in one call)
+    def runRepeat(self, tickNbr):
+        start = self._pc
+        repeat = self._repeat
+        self._repeat = 0
+        if self._rc == 0:
+            self._rc = int(self._mmu.fetch(start + 1))
+        (opcode, operand, self._ir) = self._mmu.fetchDecoded(start + 2)
+        self._or = None
+        operation = self._dispatch[opcode]
+        for _ in range(0, repeat):
+            operation()
+        self._executed += repeat
+        self._rc -= repeat
+        self._pc = start if self._rc > 0 else start + 3
+        self._logExec()
+
+    # run the block found by stepTicks (block.ticks ticks in one call)
+    def runBlock(self, tickNbr):
+        block = self._block
+        self._block = None
+        # the translations of its fetches, as if run one tick at a time
+        for addr in block.translations:
+            self._mmu.logicalToPhysicalAddress(addr)
+        block.run(self)
+        self._executed += block.ticks
+        if self._tracer.on:
+            self._tracer.record(TRACE_BLOCK, self._coreId, block.ticks, block.start,
+                    self._pc, self._ac, self._bc, self._sp, self._zf)
 
     def tick(self, tickNbr):
         if (self._pc > -1):
-            self._fetch()
-            self._decode()
-            self._execute()
+            self._executed += 1
+            if self._predecoded:
+                pc = self._pc
+                opcode = self._fetchDecoded()
+                if self._binaryTrace is None:
+                    self._dispatch[opcode]()
+                else:
+                    self._tracedDispatch(tickNbr, pc, opcode)
+                if opcode > OPCODE_EXIT and self._tracer.on:
+                    self._logExec()
+            else:
+                pc = self._pc
+                self._fetch()
+                self._decode()
+                if self._binaryTrace is not None:
+                    self._traceExecuted(tickNbr, pc, OPCODE.get(self._ir, OPCODE_NOOP))
+                self._execute()
+        elif self._tracer.on:
+            self._tracer.record(TRACE_NOOP, self._coreId)
+
+    # IO and EXIT are recorded before their irq switches the context
+    def _tracedDispatch(self, tickNbr, pc, opcode):
+        if OPCODE_LAST_OOI < opcode <= OPCODE_EXIT:
+            self._traceExecuted(tickNbr, pc, opcode)
+            self._dispatch[opcode]()
         else:
-            log.logger.info("cpu - NOOP")
+            self._dispatch[opcode]()
+            self._traceExecuted(tickNbr, pc, opcode)
+
+    def _traceExecuted(self, tickNbr, pc, opcode):
+        self._binaryTrace.execute(tickNbr, self._coreId, pc, opcode,
+                self._ac, self._bc, self._sp, self._zf)
+
+    def _fetchDecoded(self):
+        (opcode, operand, self._ir) = self._mmu.fetchDecoded(self._pc)
+        self._pc += 1
+        if opcode <= OPCODE_LAST_OOI:
+            # operand in the next page: fetch it (may page fault)
+            if operand is None or self._pc % self._mmu.frameSize == 0:
+                self._or = self._mmu.fetch(self._pc)
+                operand = int(self._or)
+            else:
+                self._or = operand
+            self._operand = operand
+            self._pc += 1
+        return opcode
+
+    ## dispatch table handlers, one per opcode
+    ## (IO and EXIT raise an IRQ, the others are logged by tick)
+    def _opIO(self):
+        ioInIRQ = IRQ(IO_IN_INTERRUPTION_TYPE, self._ir, self._coreId)
+        self._interruptVector.handle(ioInIRQ)
+
+    def _opEXIT(self):
+        print("\n\x9B7m", end="")
+        print("A Reg : ", self._ac, "/ B Reg : ", self._bc,"/ z flag: ", self._zf)
+        print("\x9B0m", end="\r")
+        killIRQ = IRQ(KILL_INTERRUPTION_TYPE, None, self._coreId)
+        self._interruptVector.handle(killIRQ)
+
+    def _opNOOP(self):
+        pass
+
+    # REP count instruction: runs instruction (at pc) once per tick,
+    # count times. pc stays on the REP until the last repetition
+    def _opREP(self):
+        self._repeatOnce()
+        self._logExec()
+
+    def _repeatOnce(self):
+        start = self._pc - 2
+        if self._rc == 0:
+            self._rc = self._operand
+        (opcode, operand, self._ir) = self._mmu.fetchDecoded(self._pc)
+        self._or = None
+        self._dispatch[opcode]()
+        self._rc -= 1
+        self._pc = start if self._rc > 0 else start + 3
+
+    def _opJNZ(self):
+        if not self._zf:
+            self._pc = self._operand
+
+    def _opJZ(self):
+        if self._zf:
+            self._pc = self._operand
+
+    def _opJMP(self):
+        self._pc = self._operand
+
+    def _opCALL(self):
+        self._sp += 1
+        self._mmu.write(self._sp, self._pc)
+        self._pc = self._operand
+
+    def _opRET(self):
+        self._pc = self._mmu.fetch(self._sp)
+        self._sp -= 1
+
+    def _opSTORA(self):
+        self._ac = self._operand
+
+    def _opSTORB(self):
+        self._bc = self._operand
+
+    def _opDECA(self):
+        self._ac -= 1
+        self._zf = (self._ac == 0)
+
+    def _opINCA(self):
+        self._ac += 1
+        self._zf = (self._ac == 0)
+
+    def _opINCB(self):
+        self._bc += 1
+        self._zf = (self._bc == 0)
+
+    def _opDECB(self):
+        self._bc -= 1
+        self._zf = (self._bc == 0)
+
+    def _opADDAB(self):
+        self._ac += self._bc
+        self._zf = self._ac == 0
+
+    def _opCMPAB(self):
+        self._zf = self._ac == self._bc
 
+    def _opPUSHA(self):
+        self._sp += 1
+        self._mmu.write(self._sp, self._ac)
+
+    def _opPOPA(self):
+        self._ac = self._mmu.fetch(self._sp)
+        self._sp -= 1
+
+    def _opPUSHB(self):
+        self._sp += 1
+        self._mmu.write(self._sp, self._bc)
+
+    def _opPOPB(self):
+        self._bc = self._mmu.fetch(self._sp)
+        self._sp -= 1
 
     def _fetch(self):
         self._ir = self._mmu.fetch(self._pc)
@@ -402,6 +1573,11 @@ class Cpu():
         #print("fetch: pc={}  ir={}".format( self._pc, self._ir))
 
     def _decode(self):
+        if self._ir == INSTRUCTION_REP:
+            self._operand = int(self._or)
+            self._repeatOnce()
+            return
+
         if self._ir == 'IO':
             #print("IO Instruction")
             pass
@@ -517,25 +1693,23 @@ class Cpu():
 
     # is One Operand Instruction
     def isOOI(self, ir):
-        return ( ir in ['JNZ', 'JZ', 'JMP', 'CALL', 'STORA', 'STORB'])
+        return ir in ONE_OPERAND_INSTRUCTIONS
 
     def _execute(self):
         if ASM.isEXIT(self._ir):
-            killIRQ = IRQ(KILL_INTERRUPTION_TYPE)
+            killIRQ = IRQ(KILL_INTERRUPTION_TYPE, None, self._coreId)
             self._interruptVector.handle(killIRQ)
         elif ASM.isIO(self._ir):
-            ioInIRQ = IRQ(IO_IN_INTERRUPTION_TYPE, self._ir)
+            ioInIRQ = IRQ(IO_IN_INTERRUPTION_TYPE, self._ir, self._coreId)
             self._interruptVector.handle(ioInIRQ)
         else:
-            log.logger.info("cpu - Exec: {instr:<6} {op:<3}, PC={pc:>3} A={ac:>3} B={bc:>3} SP={sp:>3} zflag={z}".format(
-                instr = self._ir,
-                op = self._or if self.isOOI(self._ir) else ' ',
-                pc = self._pc,
-                ac = self._ac,
-                bc = self._bc,
-                sp = self._sp,
-                z  = self._zf
-                ))
+            self._logExec()
+
+    def _logExec(self):
+        if self._tracer.on:
+            self._tracer.record(TRACE_EXEC, self._coreId, self._ir,
+                    self._or if self.isOOI(self._ir) else ' ',
+                    self._pc, self._ac, self._bc, self._sp, self._zf)
 
 
     def isBusy(self):
@@ -543,12 +1717,12 @@ class Cpu():
 
     @property
     def context(self):
-        # keep sync with so#394 and setter below
-        return (self._pc, self._ac, self._bc, self._sp, self._zf)
+        # keep sync with ProcessControlBlock and setter below
+        return (self._pc, self._ac, self._bc, self._sp, self._zf, self._rc)
 
     @context.setter
     def context(self, values):
-        (self._pc, self._ac, self._bc, self._sp, self._zf) = values
+        (self._pc, self._ac, self._bc, self._sp, self._zf, self._rc) = values
 
     @property
     def pc(self):
@@ -569,6 +1743,35 @@ class AbstractIODevice():
         self._deviceId = deviceId
         self._deviceTime = deviceTime
         self._busy = False
+        self._events = None
+        self._interruptVector = None
+        self._tracer = None
+
+    # event queue where the device schedules its completions
+    @property
+    def events(self):
+        return self._events
+
+    @events.setter
+    def events(self, events):
+        self._events = events
+
+    @property
+    def tracer(self):
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, tracer):
+        self._tracer = tracer
+
+    # interrupt vector of the hardware where the device is plugged
+    @property
+    def interruptVector(self):
+        return self._interruptVector
+
+    @interruptVector.setter
+    def interruptVector(self, interruptVector):
+        self._interruptVector = interruptVector
 
     @property
     def deviceId(self):
@@ -591,6 +1794,8 @@ class AbstractIODevice():
             self._busy = True
             self._ticksCount = 0
             self._operation = operation
+            if self._events is not None:
+                self._events.schedule(self._deviceTime + 1)
 
     def tick(self, tickNbr):
         if (self._busy):
@@ -599,9 +1804,22 @@ class AbstractIODevice():
                 ## operation execution has finished
                 self._busy = False
                 ioOutIRQ = IRQ(IO_OUT_INTERRUPTION_TYPE, self._deviceId)
-                HARDWARE.interruptVector.handle(ioOutIRQ)
-            else:
-                log.logger.info("device {deviceId} - Busy: {ticksCount} of {deviceTime}".format(deviceId = self.deviceId, ticksCount = self._ticksCount, deviceTime = self._deviceTime))
+                self._interruptVector.handle(ioOutIRQ)
+            elif self._tracer is not None and self._tracer.on:
+                self._tracer.record(TRACE_DEVICE, self._deviceId, self._ticksCount, self._deviceTime)
+
+    # ticks that can elapse before the operation finishes
+    def quietTicks(self):
+        if (self._busy):
+            return self._deviceTime - self._ticksCount
+        return float('inf')
+
+    # skip count ticks (less than quietTicks)
+    def skipTicks(self, tickNbr, count):
+        if (self._busy):
+            self._ticksCount += count
+            if self._tracer is not None and self._tracer.on:
+                self._tracer.record(TRACE_DEVICE, self._deviceId, self._ticksCount, self._deviceTime)
 
 
 class PrinterIODevice(AbstractIODevice):
@@ -611,26 +1829,89 @@ class PrinterIODevice(AbstractIODevice):
 
 class Timer:
 
-    def __init__(self, cpu, interruptVector):
+    def __init__(self, cpu, interruptVector, coreId = 0):
         self._cpu = cpu
         self._interruptVector = interruptVector
+        self._coreId = coreId
         self._tickCount = 0    # cantidad de de ciclos “ejecutados” por el proceso actual
         self._active = False    # por default esta desactivado
         self._quantum = 0   # por default esta desactivado
+        self._events = None # where the quantum expiry is scheduled
+        self._timeout = None # the pending quantum expiry
+        self._lastTick = -1 # last tick counted
+
+    @property
+    def events(self):
+        return self._events
+
+    @events.setter
+    def events(self, events):
+        self._events = events
+
+    # replaces the pending expiry (the quantum starts again)
+    def __scheduleTimeout(self):
+        if self._active and self._events is not None:
+            if self._timeout is not None:
+                self._events.cancel(self._timeout)
+            ticks = self._quantum - self._tickCount
+            # the current tick is still to be counted
+            if self._lastTick == self._events.current:
+                ticks += 1
+            self._timeout = self._events.schedule(ticks)
 
     def tick(self, tickNbr):
         # registro que el proceso en CPU corrio un ciclo mas
         self._tickCount += 1
+        self._lastTick = tickNbr
 
         if self._active and (self._tickCount > self._quantum) and self._cpu.isBusy():
             # se “cumplio” el limite de ejecuciones
-            timeoutIRQ = IRQ(TIMEOUT_INTERRUPTION_TYPE)
+            timeoutIRQ = IRQ(TIMEOUT_INTERRUPTION_TYPE, None, self._coreId)
             self._interruptVector.handle(timeoutIRQ)
         else:
             self._cpu.tick(tickNbr)
 
+    # ticks that can elapse before the quantum expires (an idle
+    # cpu can not expire it)
+    def quietTicks(self):
+        if self._active and self._cpu.isBusy():
+            return self._quantum - self._tickCount
+        return float('inf')
+
+    def isIdle(self):
+        return not self._cpu.isBusy()
+
+    # see Cpu.stepTicks
+    def stepTicks(self, limit):
+        return self._cpu.stepTicks(limit)
+
+    # the cpu is idle: count ticks without running it
+    def skipTicks(self, tickNbr, count):
+        self._tickCount += count
+        self._lastTick = tickNbr + count - 1
+
+    # run the cpu up to limit ticks (see Clock.fastForward), stops before
+    # an instruction that raises an interruption. Returns ticks run
+    def burst(self, tickNbr, limit, untilEvent):
+        count = 0
+        while count < limit:
+            ticks = self._cpu.stepTicks(limit - count, not untilEvent)
+            if ticks == 0:
+                break
+            # counted before the step, as tick() does (a page fault resets it)
+            self._tickCount += ticks
+            self._lastTick = tickNbr + count + ticks - 1
+            if self._events is not None:
+                self._events.current = self._lastTick
+            self._cpu.step(tickNbr + count)
+            count += ticks
+            if not untilEvent:
+                break
+        return count
+
     def reset(self):
            self._tickCount = 0
+           self.__scheduleTimeout()
 
     @property
     def quantum(self):
@@ -640,25 +1921,179 @@ class Timer:
     def quantum(self, quantum):
         self._active = True
         self._quantum = quantum
+        self.__scheduleTimeout()
+
+
 
+## a core of a multi-core cpu: its own Cpu, MMU (and TLB) and Timer
+## all the cores share the memory and the interrupt vector
+class Core():
 
+    def __init__(self, coreId, memory, interruptVector, tracer, tlbEntries = TLB_ENTRIES, tlbWays = TLB_WAYS):
+        self._id = coreId
+        self._mmu = MMU(memory, interruptVector, tracer, coreId, tlbEntries, tlbWays)
+        self._cpu = Cpu(self._mmu, interruptVector, tracer, coreId)
+        self._timer = Timer(self._cpu, interruptVector, coreId)
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def mmu(self):
+        return self._mmu
+
+    @property
+    def cpu(self):
+        return self._cpu
+
+    @property
+    def timer(self):
+        return self._timer
+
+    def __repr__(self):
+        return "Core {id}: {cpu}".format(id=self._id, cpu=self._cpu)
+
+
+## clock subscriber of a multi-core hardware: ticks the timer (and cpu)
+## of every core, in core order. Bursts run the cores in lock step, one
+## instruction per core and tick, so page faults happen in the same order
+## than with tick by tick execution
+class MultiCoreTimer():
+
+    def __init__(self, cores):
+        self._timers = [core.timer for core in cores]
+
+    def tick(self, tickNbr):
+        for timer in self._timers:
+            timer.tick(tickNbr)
+
+    def quietTicks(self):
+        return min(timer.quietTicks() for timer in self._timers)
+
+    def isIdle(self):
+        for timer in self._timers:
+            if not timer.isIdle():
+                return False
+        return True
+
+    # every cpu is idle
+    def skipTicks(self, tickNbr, count):
+        for timer in self._timers:
+            timer.skipTicks(tickNbr, count)
+
+    # ticks in which every busy core runs an instruction without raising
+    # an interruption (see Timer.burst)
+    def burst(self, tickNbr, limit, untilEvent):
+        count = 0
+        while untilEvent and count < limit:
+            busy = [timer for timer in self._timers if not timer.isIdle()]
+            if not busy:
+                break
+            for timer in busy:
+                if timer.stepTicks(1) == 0:
+                    return count
+            events = self._timers[0].events
+            if events is not None:
+                events.current = tickNbr + count
+            for timer in self._timers:
+                if timer.isIdle():
+                    timer.skipTicks(tickNbr + count, 1)
+                elif timer.burst(tickNbr + count, 1, True) == 0:
+                    # a page fault of a previous core evicted its page
+                    timer.tick(tickNbr + count)
+            count += 1
+        return count
 
 
 ## emulates the Hardware that were the Operative System run
 class Hardware():
 
     ## Setup our hardware
-    def setup(self, memorySize):
+    def setup(self, memorySize, cores = 1, tlbEntries = TLB_ENTRIES, tlbWays = TLB_WAYS, trace = False):
         ## add the components to the "motherboard"
         self._memory = Memory(memorySize)
-        self._interruptVector = InterruptVector()
-        self._clock = Clock()
+        self._tracer = Tracer(on = trace)
+        self._interruptVector = InterruptVector(self._tracer)
+        self._clock = Clock(self._tracer)
         self._ioDevice = PrinterIODevice()
-        self._mmu = MMU(self._memory)
-        self._cpu = Cpu(self._mmu, self._interruptVector)
-        self._timer = Timer(self._cpu, self._interruptVector)
+        self._cores = [Core(coreId, self._memory, self._interruptVector, self._tracer, tlbEntries, tlbWays)
+                       for coreId in range(0, cores)]
+        ## core 0 is "the" cpu of a single core hardware
+        self._mmu = self._cores[0].mmu
+        self._cpu = self._cores[0].cpu
+        self._timer = self._cores[0].timer
+        self._ioDevice.events = self._clock.events
+        self._ioDevice.interruptVector = self._interruptVector
+        self._ioDevice.tracer = self._tracer
+        for core in self._cores:
+            core.timer.events = self._clock.events
+        if cores == 1:
+            self._ticker = self._timer
+        else:
+            self._ticker = MultiCoreTimer(self._cores)
         self._clock.addSubscriber(self._ioDevice)
-        self._clock.addSubscriber(self._timer)
+        self._clock.addSubscriber(self._ticker)
+
+    ## run compiled basic blocks of code (several ticks at once)
+    @property
+    def blockMode(self):
+        return self._cpu.blocks
+
+    @blockMode.setter
+    def blockMode(self, value):
+        for core in self._cores:
+            core.cpu.blocks = value
+        self.__updateRunner()
+
+    ## writer of the binary execution trace (see bintrace.py), None: off
+    @property
+    def binaryTrace(self):
+        return self._interruptVector.binaryTrace
+
+    @binaryTrace.setter
+    def binaryTrace(self, writer):
+        self._interruptVector.binaryTrace = writer
+        for core in self._cores:
+            core.cpu.binaryTrace = writer
+
+    ## run cpu bursts up to the next event in a single clock tick
+    @property
+    def fastForward(self):
+        return self._clock.fastForward
+
+    @fastForward.setter
+    def fastForward(self, value):
+        self._clock.fastForward = value
+        self.__updateRunner()
+
+    def __updateRunner(self):
+        if self._cpu.blocks or self._clock.fastForward:
+            self._clock.runner = self._ticker
+        else:
+            self._clock.runner = None
+
+    ## headless run: simulates up to tick untilTick (see Clock.runUntil)
+    def runUntil(self, untilTick):
+        fastForward = self.__headless()
+        try:
+            self._clock.runUntil(untilTick)
+        finally:
+            self.fastForward = fastForward
+
+    ## headless run until the cpu is idle and no device is busy
+    def runUntilIdle(self, maxTicks = float('inf')):
+        fastForward = self.__headless()
+        try:
+            return self._clock.runUntilIdle(maxTicks)
+        finally:
+            self.fastForward = fastForward
+
+    # runs in fast forward mode, returns the previous mode (to restore it)
+    def __headless(self):
+        fastForward = self._clock.fastForward
+        self.fastForward = True
+        return fastForward
 
     def switchOn(self):
         log.logger.info(" ---- SWITCH ON ---- ")
@@ -672,6 +2107,20 @@ class Hardware():
     def cpu(self):
         return self._cpu
 
+    @property
+    def cores(self):
+        return self._cores
+
+    ## sets the quantum of the timer of every core
+    @property
+    def quantum(self):
+        return self._timer.quantum
+
+    @quantum.setter
+    def quantum(self, quantum):
+        for core in self._cores:
+            core.timer.quantum = quantum
+
     @property
     def clock(self):
         return self._clock
@@ -680,6 +2129,11 @@ class Hardware():
     def interruptVector(self):
         return self._interruptVector
 
+    ## ring buffer of trace events of every component
+    @property
+    def tracer(self):
+        return self._tracer
+
     @property
     def memory(self):
         return self._memory
@@ -706,9 +2160,7 @@ class Hardware():
         self._clock.tickUnitInSec = value
 
     def __repr__(self):
+        if len(self._cores) > 1:
+            return "HARDWARE state {cores}\n{mem}".format(cores=self._cores, mem=self._memory)
         return "HARDWARE state {cpu}\n{mem}".format(cpu=self._cpu, mem=self._memory)
 
-### HARDWARE is a global variable
-### can be access from any
-HARDWARE = Hardware()
-
@@ -14,13 +14,21 @@ if __name__ == '__main__':
     log.logger.info('Starting emulator')
 
     ## setup our hardware and set memory size to 32 "cells"
-    HARDWARE.setup(8)
-    HARDWARE.timeUnit = 1
+    hardware = Hardware()
+    hardware.setup(8)
+    hardware.timeUnit = 1
 
     SCHEDULER_FCFS = 'FCFS'
     SCHEDULER_RR = 'RR'
     SCHEDULER_NP = 'NP'
     SCHEDULER_P = 'P'
+    SCHEDULER_SJF = 'SJF'
+    SCHEDULER_SRTF = 'SRTF'
+    SCHEDULER_CFS = 'CFS'
+    SCHEDULER_MLFQ = 'MLFQ'
+    SCHEDULER_STRIDE = 'STRIDE'
+    SCHEDULER_LOTTERY = 'LOTTERY'
+    SCHEDULER_EDF = 'EDF'
 
     #scheduler choose
     sche = SCHEDULER_FCFS #<<<<<<< choose here or at cli
@@ -29,7 +37,7 @@ if __name__ == '__main__':
         sche = sys.argv[1]
 
     if sche == SCHEDULER_RR:
-        timer = HARDWARE.timer
+        timer = hardware.timer
         timer.quantum = 4
         scheduler = SchedulerRRB()
     if sche == SCHEDULER_FCFS:
@@ -38,16 +46,32 @@ if __name__ == '__main__':
         scheduler = SchedulerNonPreemtive()
     if sche == SCHEDULER_P:
         scheduler = SchedulerPreemtive()
+    if sche == SCHEDULER_SJF:
+        scheduler = SchedulerSJF()
+    if sche == SCHEDULER_SRTF:
+        scheduler = SchedulerSRTF()
+    if sche == SCHEDULER_CFS:
+        scheduler = SchedulerCFS()
+    if sche == SCHEDULER_MLFQ:
+        scheduler = SchedulerMLFQ()
+    if sche == SCHEDULER_STRIDE:
+        hardware.timer.quantum = 4
+        scheduler = SchedulerStride()
+    if sche == SCHEDULER_LOTTERY:
+        hardware.timer.quantum = 4
+        scheduler = SchedulerLottery()
+    if sche == SCHEDULER_EDF:
+        scheduler = SchedulerEDF()
 
     print("Runnnig", scheduler.name)
 
 
     ## Switch on computer
-    HARDWARE.switchOn()
+    hardware.switchOn()
 
     ## new create the Operative System Kernel
     # "booteamos" el sistema operativo
-    kernel = Kernel(HARDWARE,scheduler, frameSize = 4)
+    kernel = Kernel(hardware,scheduler, frameSize = 4)
     # sleep(1)
 
     # Ahora vamos a intentar ejecutar 3 programas a la vez
@@ -78,7 +102,7 @@ if __name__ == '__main__':
     kernel.run("/prg2",0)
     kernel.run("/prg3",0)
     #kernel.run("/prg3",2)
-    #sleep(32 * HARDWARE.timeUnit)
+    #sleep(32 * hardware.timeUnit)
     #kernel.run("/prg1",1)
     #kernel.run("/prg2",0)
     #kernel.run("/prg3",0)
@@ -17,7 +17,14 @@ class shell:
     pcbtable       : muestra el contenido de la tabla de PCB
     ticktime n     : establece el tiempo en segundos de cada tick
     tick [n]       : envia n (o 1 por omision) tick de clock a los dispositivos subscriptos
+    fastforward on|off : ejecuta las rafagas de CPU hasta el proximo evento en un solo tick
+    trace [n|on|off] : muestra los ultimos n (o 50) eventos de la traza, o la activa/desactiva (desactivada al inicio)
+    gantt [desde [hasta]] [pid ...] : muestra el diagrama de gantt de esos ticks (o los ultimos 60) y pids
+    metrics        : muestra los tiempos de retorno, espera y respuesta, throughput y uso de CPU
+    tlb [reset]    : muestra los aciertos, fallos, desalojos y vaciados de la TLB de cada core
+    frames         : muestra los frames usados por cada proceso, las cargas y los desalojos
     ls             : lista los programas salvados
+    programa [prioridad [deadline [peor caso [periodo [jobs]]]]] : ejecuta el programa, con deadline es de tiempo real (EDF), con periodo se repite
     """
 
     def com(kernel):
@@ -37,43 +44,80 @@ class shell:
         for f  in kernel.fileSystem.root:
             print("{:<8} {}".format(f, kernel.fileSystem.root.get(f)))
 
+    # programa [prioridad [deadline [peor caso [periodo [jobs]]]]]
     def _run(args, kernel):
-        kernel.run(args[0], 3 if len(args) < 2 else int(args[1]))
+        kernel.run(args[0], 3 if len(args) < 2 else int(args[1]),
+                   *[int(arg) for arg in args[2:6]])
 
     def _ticktime(args, kernel):
-        HARDWARE.timeUnit = float(args[0])
+        kernel.hardware.timeUnit = float(args[0])
 
-    def __tick(count):
-        nbrTick = 0
-        while count != nbrTick:
-            nbrTick += 1
-            HARDWARE.clock.tick(nbrTick)
+    def __tick(hardware, count):
+        hardware.clock.do_ticks(count)
 
     def _tick(args, kernel):
         times = int(args[0])
-        thread_shell_tick = Thread(target = shell.__tick, kwargs = dict(count=times))
+        thread_shell_tick = Thread(target = shell.__tick, kwargs = dict(hardware=kernel.hardware, count=times))
         thread_shell_tick.start()
         #thread_shell_tick.join()
 
+    def _fastforward(args, kernel):
+        kernel.hardware.fastForward = args[0] == 'on'
+        print("fastforward", 'on' if kernel.hardware.fastForward else 'off')
+
+    def _trace(args, kernel):
+        tracer = kernel.hardware.tracer
+        if args and args[0] in ['on', 'off']:
+            tracer.on = args[0] == 'on'
+            print("trace", args[0])
+        else:
+            for line in tracer.dump(50 if not args else int(args[0])):
+                print(line)
+
+    def _gantt(args, kernel):
+        gantt = kernel.gantt
+        last = gantt.ticks() + 1
+        first = max(0, last - 60)
+        if args:
+            first = int(args[0])
+        if len(args) > 1:
+            last = int(args[1])
+        pids = [int(pid) for pid in args[2:]] if len(args) > 2 else None
+        print(gantt.render(first, last, pids))
+
+    def _metrics(args, kernel):
+        print(kernel.metrics)
+
+    def _tlb(args, kernel):
+        for core in kernel.hardware.cores:
+            print("core {} {}".format(core.id, core.mmu.tlb))
+            if args and args[0] == 'reset':
+                core.mmu.tlb.clearStats()
+
+    def _frames(args, kernel):
+        print(kernel.memoryManager.frameTable)
+
     def _help(args, kernel):
         print(shell.help_c)
 
     def _start(args, kernel):
-        HARDWARE.switchOn()
+        kernel.hardware.switchOn()
 
     def _stop(args, kernel):
-        HARDWARE.switchOff()
+        kernel.hardware.switchOff()
 
     def _quit(args, kernel):
-        HARDWARE.switchOff()
+        kernel.hardware.switchOff()
+        # the trace is only formatted if the log shows it
+        log.logger.info(kernel.hardware.tracer)
         #_consolaCorriendo = False
         return True
 
     def _reset(args, kernel):
-        print(HARDWARE.setup(args[0]))
+        print(kernel.hardware.setup(args[0]))
 
     def _state(args, kernel):
-        print(HARDWARE.cpu, HARDWARE.mmu)
+        print(kernel.hardware.cpu, kernel.hardware.mmu)
 
     def _iodevice(args, kernel):
         print(kernel.ioDeviceController)
@@ -82,7 +126,7 @@ class shell:
         print(kernel.scheduler)
 
     def _memory(args, kernel):
-        print(HARDWARE.memory)
+        print(kernel.hardware.memory)
 
     def _pcbtable(args, kernel):
         if kernel.pcbTable.runningPCB != None:
@@ -92,9 +136,7 @@ class shell:
 
     def _default(args, kernel):
         if kernel.fileSystem.read(args[0]) != None:
-            kernel.run(args[0], 
-                    3 if len(args) < 2 
-                    else int(args[1]))
+            shell._run(args, kernel)
 
     def _nothing(args, kernel):
         pass
@@ -114,6 +156,12 @@ class shell:
             memory     = _memory,
             pcbtable   = _pcbtable,
             tick       = _tick,
+            fastforward = _fastforward,
+            trace      = _trace,
+            gantt      = _gantt,
+            metrics    = _metrics,
+            tlb        = _tlb,
+            frames     = _frames,
             quit       = _quit)
     commands.update({'':_nothing})
 
@@ -3,22 +3,38 @@
 from hardware import *
 import log
 from enum import Enum
+from array import array
+from bisect import bisect_right
+from collections import deque
+from itertools import compress
+import copy
+import heapq
+import random
+import sys
 
 
 ## emulates a compiled program
+## optimize: encode repeated instructions with REP (see ASM.peephole)
 class Program():
 
-    def __init__(self, instructions):
-        self._instructions = self.expand(instructions)
+    def __init__(self, instructions, optimize = False):
+        self._instructions = self.expand(instructions, optimize)
+        self._decoded = ASM.decode(self._instructions)
 
     @property
     def instructions(self):
         return self._instructions
 
+    # pre-decoded instructions, parallel to instructions
+    @property
+    def decoded(self):
+        return self._decoded
+
     def addInstr(self, instruction):
         self._instructions.append(instruction)
+        self._decoded = ASM.decode(self._instructions)
 
-    def expand(self, instructions):
+    def expand(self, instructions, optimize = False):
         expanded = []
         for i in instructions:
             if isinstance(i, list):
@@ -34,6 +50,8 @@ class Program():
         if not ASM.isEXITorRET(last):
             expanded.append(INSTRUCTION_EXIT)
 
+        if optimize:
+            expanded = ASM.peephole(expanded)
         return ASM.secondPass(expanded)
 
     def __repr__(self):
@@ -88,78 +106,124 @@ class AbstractInterruptionHandler():
     def execute(self, irq):
         log.logger.error("-- EXECUTE MUST BE OVERRIDEN in class {classname}".format(classname=self.__class__.__name__))
 
-    def contextSwitchFromRunningTo (self, toState):
-        prevPCB = self.kernel.pcbTable.runningPCB
-        prevPCB.state = toState
+    # core that raised the irq (0 if it was not raised by a core)
+    def coreOf(self, irq):
+        return 0 if irq.core is None else irq.core
+
+    # every state change goes through here to account its ticks
+    def setState(self, pcb, state):
+        pcb.changeState(state, self.kernel.now())
+        if state in (State.swaiting, State.sterminated):
+            # the cpu burst ends on io or exit
+            self.kernel.scheduler.burstEnded(pcb, pcb.endBurst())
+        if state == State.sterminated:
+            self.kernel.metrics.finished(pcb)
+
+    def contextSwitchFromRunningTo (self, toState, core = 0):
+        prevPCB = self.kernel.pcbTable.getRunning(core)
+        self.setState(prevPCB, toState)
         self.kernel.dispacher.save(prevPCB)
-        self.kernel.pcbTable.runningPCB = None
+        self.kernel.pcbTable.setRunning(core, None)
         if toState == State.sterminated:
             self.kernel.pcbTable.remove(prevPCB.pid)
         else:
             self.kernel.pcbTable.update(prevPCB)
-        if self.kernel.scheduler.hasNext():
-            nextPCB = self.kernel.scheduler.getNext()
-            nextPCB.state = State.srunning
-            self.kernel.pcbTable.runningPCB = nextPCB
+        if self.kernel.scheduler.hasNext(core):
+            nextPCB = self.kernel.scheduler.getNext(core)
+            self.setState(nextPCB, State.srunning)
+            self.kernel.pcbTable.setRunning(core, nextPCB)
             self.kernel.pcbTable.update(nextPCB)
-            self.kernel.dispacher.load(nextPCB)
+            self.kernel.dispacher.load(nextPCB, core)
         return prevPCB
 
     def contextSwitchToReadyOrRunning(self, nextPCB):
-        if self.kernel.pcbTable.runningPCB == None:
-            self.kernel.dispacher.load(nextPCB)
-            nextPCB.state = State.srunning
-            self.kernel.pcbTable.runningPCB = nextPCB
+        core = self.kernel.pcbTable.idleCore()
+        if core is not None:
+            self.kernel.dispacher.load(nextPCB, core)
+            self.setState(nextPCB, State.srunning)
+            self.kernel.pcbTable.setRunning(core, nextPCB)
         else:
-            nextPCB.state = State.sready
-            prevPCB = self.kernel.pcbTable.runningPCB
-            if  self.kernel.scheduler.mustExpropiate(prevPCB, nextPCB):
-                self.contextSwapPreemtive(nextPCB, prevPCB)
-                nextPCB.state = State.srunning
+            self.setState(nextPCB, State.sready)
+            # of the processes that must leave the cpu, the worst one does
+            candidates = [prevPCB for prevPCB in self.kernel.pcbTable.runningPCBs
+                          if self.kernel.scheduler.mustExpropiate(prevPCB, nextPCB)]
+            if candidates:
+                self.contextSwapPreemtive(nextPCB, self.kernel.scheduler.victim(candidates))
+                self.setState(nextPCB, State.srunning)
             else : 
                 self.kernel.scheduler.add(nextPCB)
         self.kernel.pcbTable.update(nextPCB)
 
     def contextSwapPreemtive(self, nextPCB, prevPCB):
-        prevPCB.state = State.sready
-        self.kernel.pcbTable.runningPCB = nextPCB
+        core = prevPCB.core
+        self.setState(prevPCB, State.sready)
+        self.kernel.pcbTable.setRunning(core, nextPCB)
         self.kernel.dispacher.save(prevPCB)
         self.kernel.pcbTable.update(prevPCB)
-        self.kernel.dispacher.load(nextPCB)
+        self.kernel.dispacher.load(nextPCB, core)
         self.kernel.scheduler.add(prevPCB)
+        self.dispatchIdleCores()
 
-    def contextSwapPreemtiveTimeOut(self, nextPCB):
-        nextPCB.state = State.sready
-        prevPCB = self._kernel.pcbTable.runningPCB
+    def contextSwapPreemtiveTimeOut(self, nextPCB, core = 0):
+        self.setState(nextPCB, State.sready)
+        prevPCB = self._kernel.pcbTable.getRunning(core)
         self.contextSwapPreemtive(nextPCB, prevPCB)
-        nextPCB.state = State.srunning
+        self.setState(nextPCB, State.srunning)
         self.kernel.pcbTable.update(nextPCB)
 
+    # idle cores take (steal) work from the ready queues
+    def dispatchIdleCores(self):
+        core = self.kernel.pcbTable.idleCore()
+        while core is not None and self.kernel.scheduler.hasNext(core):
+            nextPCB = self.kernel.scheduler.getNext(core)
+            self.setState(nextPCB, State.srunning)
+            self.kernel.pcbTable.setRunning(core, nextPCB)
+            self.kernel.pcbTable.update(nextPCB)
+            self.kernel.dispacher.load(nextPCB, core)
+            core = self.kernel.pcbTable.idleCore()
+
 
 class KillInterruptionHandler(AbstractInterruptionHandler):
 
     def execute(self, irq):
         log.logger.info(" Program Finished ")
-        pcb = self.kernel.pcbTable.runningPCB 
-        self.contextSwitchFromRunningTo(State.sterminated)
-        pages= self.kernel.memoryManager.getPageTable(pcb.pid)
-        for i in range(0, len(pages)):
-            if(pages[i].isValid == True):
-                #print("Pagina a liberar en KILL ", pages[i])
-                self.kernel._memoryManager.freeFrames(pages[i].returnFrame)
-                self.kernel._memoryManager.removePage(pages[i])
+        pcb = self.kernel.pcbTable.getRunning(self.coreOf(irq))
+        periodic = pcb.hasNextJob()
+        if periodic:
+            # the job ends, the pcb waits for its next release
+            self.kernel.metrics.jobDone(pcb, self.kernel.now())
+            self.contextSwitchFromRunningTo(State.swaiting, self.coreOf(irq))
+        else:
+            self.contextSwitchFromRunningTo(State.sterminated, self.coreOf(irq))
+        for core in self.kernel.hardware.cores:
+            core.mmu.tlb.flushAsid(pcb.pid)
+        self.kernel.memoryManager.releaseFrames(pcb.pid)
+        if periodic:
+            # the next job runs a fresh image of the program
+            pcb.restart()
+            self.kernel.memoryManager.putPageTable(pcb.pid, self.kernel.loader.create(pcb.path, pcb.pid))
+            self.kernel.releases.add(pcb)
 
 
 class NewInterruptionHandler(AbstractInterruptionHandler):
 
     def execute(self, irq):
-        programName, programCode, priority = irq.parameters
-        priority = 4 if priority > 4 or priority < 0 else priority
+        programName, programCode, priority, deadline, worstCase, period, jobs = irq.parameters
+        levels = self.kernel.scheduler.levels
+        priority = levels - 1 if priority >= levels or priority < 0 else priority
         log.logger.info("New loading {} {}".format(programName, priority))
-        pcb = ProcessControlBlock(programName, priority)
+        pcb = ProcessControlBlock(self.kernel.pids.new(), programName, priority)
         pages = self.kernel.loader.create(programName, pcb.pid)
         limit = self.kernel.loader.codeSize(programName)
-        pcb.state = State.snew
+        self.setState(pcb, State.snew)
+        if period is not None and deadline is None:
+            deadline = period
+        if deadline is not None:
+            # real time: the worst case defaults to the code size (no loops)
+            pcb.setDeadline(deadline, limit if worstCase is None else worstCase, self.kernel.now(), period, jobs)
+            if not self.kernel.scheduler.admit(pcb):
+                log.logger.warning("{} not admitted as real time, runs without deadline".format(programName))
+                pcb.setDeadline(None, None, self.kernel.now())
         pcb.limit = limit
         self.kernel.memoryManager.putPageTable(pcb.pid, pages)
         self.kernel.pcbTable.update(pcb) #add pcb
@@ -171,7 +235,7 @@ class IoInInterruptionHandler(AbstractInterruptionHandler):
 
     def execute(self, irq):
         operation = irq.parameters
-        pcb = self.contextSwitchFromRunningTo(State.swaiting)
+        pcb = self.contextSwitchFromRunningTo(State.swaiting, self.coreOf(irq))
         log.logger.info(self.kernel.ioDeviceController)
         self.kernel.ioDeviceController.runOperation(pcb, operation)
 
@@ -180,7 +244,7 @@ class IoOutInterruptionHandler(AbstractInterruptionHandler):
 
     def execute(self, irq):
         pcb = self.kernel.ioDeviceController.getFinishedPCB()
-        pcb.state = State.sready
+        self.setState(pcb, State.sready)
         self.kernel.pcbTable.update(pcb) #update pcb
         # to ready or running
         self.contextSwitchToReadyOrRunning(pcb)
@@ -192,33 +256,54 @@ class TimeoutInterruptionHandler(AbstractInterruptionHandler):
 
     def execute(self, irq):
         
-        if self.kernel.scheduler.hasNext():
-            pcb = self.kernel.scheduler.getNext()
-            self.contextSwapPreemtiveTimeOut(pcb)
+        core = self.coreOf(irq)
+        # the running pcb used up its quantum
+        prevPCB = self.kernel.pcbTable.getRunning(core)
+        self.kernel.scheduler.expired(prevPCB)
+        if self.kernel.scheduler.hasNext(core) and not self.kernel.scheduler.keepsRunning(prevPCB):
+            pcb = self.kernel.scheduler.getNext(core)
+            self.contextSwapPreemtiveTimeOut(pcb, core)
         else:
-            self.kernel.dispacher.resetTimer()
+            self.kernel.dispacher.resetTimer(core)
+
+## the next job of a periodic pcb is released: its deadline is
+## relative to the release
+class ReleaseInterruptionHandler(AbstractInterruptionHandler):
+
+    def execute(self, irq):
+        pcb = irq.parameters
+        pcb.rearm(pcb.nextRelease)
+        if not self.kernel.scheduler.admit(pcb):
+            log.logger.warning("{} not admitted as real time, runs without deadline".format(pcb.path))
+            pcb.setDeadline(None, None, self.kernel.now())
+        self.setState(pcb, State.sready)
+        self.kernel.pcbTable.update(pcb)
+        # to ready or running
+        self.contextSwitchToReadyOrRunning(pcb)
+
 
 class PageFaultInterruptionHandler(AbstractInterruptionHandler):
 
     def execute(self, irq):
-        pagesToUpdate = self.kernel.hardware.mmu.getPages
-        runningPCB = self.kernel.pcbTable.runningPCB
+        core = self.coreOf(irq)
+        runningPCB = self.kernel.pcbTable.getRunning(core)
 
-        self.kernel.memoryManager.update(runningPCB.pid, pagesToUpdate)
         #self.kernel.memoryManager.saveInst(pagesToUpdate,runningPCB)
         ## MEMORY MANAGER GET FRAME   self.kernel.HARDWARE.MMU.chooseVictim()
         #self.kernel.memoryManager = updatePageTable() ##DE TLB A MM
         freeFrame = self.kernel.memoryManager.getFreeFrame()
         #pageNumber = runningPCB.pc  // self.kernel.memoryManager.frameSize
         pageNumber = irq.parameters
-        page = self.kernel.memoryManager.getPage(self.kernel.pcbTable.runningPCB.pid, pageNumber)
+        page = self.kernel.memoryManager.getPage(runningPCB.pid, pageNumber)
         page.frame = freeFrame
         #print("freeFrame ", freeFrame)
         self.kernel.loader.loadPage(runningPCB, page, pageNumber, freeFrame)
         #print("page to update ", page)
+        # the page table entry is updated in place, the tlb points to it
         self.kernel.memoryManager.setPage(runningPCB.pid, pageNumber, page)
-        pages = self.kernel.memoryManager.getPageTable(runningPCB.pid)
-        self.kernel.dispacher.loadTlb(pages)
+        # the timeslice given by the scheduler is not restarted
+        if not self.kernel.scheduler.hasTimeslice:
+            self.kernel.dispacher.resetTimer(core)
         #print(self._kernel.hardware)
         #print("pcb en ejecucion ------->", runningPCB)
 
@@ -226,36 +311,53 @@ class PageFaultInterruptionHandler(AbstractInterruptionHandler):
 class Dispacher():
     def __init__(self, kernel):
         self._kernel = kernel
+        self._contextSwitches = 0 # pcbs loaded in a cpu
 
-    def load(self, pcb):
+    @property
+    def contextSwitches(self):
+        return self._contextSwitches
+
+    def load(self, pcb, core = 0):
+        self._contextSwitches += 1
+        tracer = self._kernel.hardware.tracer
+        if tracer.on:
+            tracer.record(TRACE_SWITCH, core, pcb.pid)
+        if self._kernel.hardware.binaryTrace is not None:
+            self._kernel.hardware.binaryTrace.switch(tracer.now, core, pcb.pid)
+        hwCore = self._kernel.hardware.cores[core]
+        pcb.core = core
+        timeslice = self._kernel.scheduler.timeslice(pcb, core)
+        if timeslice is not None:
+            hwCore.timer.quantum = timeslice
         #HARDWARE.cpu.pc = pcb.pc
-        HARDWARE.cpu.context = pcb.context #all reg in a big tuple
-        HARDWARE.mmu.baseDir = pcb.baseDir
+        hwCore.cpu.context = pcb.context #all reg in a big tuple
+        hwCore.mmu.baseDir = pcb.baseDir
         #print("Limite del pcb actual es:", pcb.limit, "el pcb es", pcb.pid)
-        HARDWARE.mmu.limit = pcb.limit
-        HARDWARE.mmu.resetTLB()
-        pages = self._kernel.memoryManager.getPageTable(pcb.pid)
-        #print("cantidad de paginas a cargar en la pagetable", len(pages))
-        #pages = pcb.pages
-        self.loadTlb(pages)
-        #print("pid: ", pcb.pid, "prio: ", pcb.priority, "TLB: ", HARDWARE.mmu._tlb)
-
-    def loadTlb(self,pages):
-        #print("Paginas a cargar: ", pages)
-        for page in range(0, len(pages)):
-            HARDWARE.mmu.setPageFrame(page, pages[page])
-        HARDWARE.timer.reset()
+        hwCore.mmu.limit = pcb.limit
+        hwCore.mmu.addressSpace = self._kernel.fileSystem.read(pcb.path)
+        # the tlb keeps the entries of every pid, it is not flushed
+        hwCore.mmu.asid = pcb.pid
+        hwCore.mmu.pageTableBase = self._kernel.memoryManager.getPageTable(pcb.pid)
+        hwCore.timer.reset()
 
     def save(self, pcb):
-        pcb.context = HARDWARE.cpu.context # all regs in a big tuple
+        if self._kernel.hardware.binaryTrace is not None:
+            self._kernel.hardware.binaryTrace.switch(self._kernel.hardware.tracer.now, pcb.core, -1)
+        cpu = self._kernel.hardware.cores[pcb.core].cpu
+        pcb.context = cpu.context # all regs in a big tuple
         #pcb.pc = HARDWARE.cpu.pc
-        HARDWARE.cpu.pc = -1
+        cpu.pc = -1
 
-    def resetTimer(self):
-        HARDWARE.timer.reset()
+    # the running pcb goes on with a new quantum
+    def resetTimer(self, core = 0):
+        timer = self._kernel.hardware.cores[core].timer
+        timeslice = self._kernel.scheduler.timeslice(self._kernel.pcbTable.getRunning(core), core)
+        if timeslice is not None:
+            timer.quantum = timeslice
+        timer.reset()
 
     def addSubscriber(self, subscriber):
-        HARDWARE.clock.addSubscriber(subscriber)
+        self._kernel.hardware.clock.addSubscriber(subscriber)
 
 
 #enum states of a process
@@ -269,24 +371,13 @@ class State(Enum):
 
 #emul pcb table
 class PcbTable():
-    def __init__(self):
+    def __init__(self, cores = 1):
         self._tablePcb = dict()
-        self._running = None
+        self._running = [None] * cores # running pcb of each core
 
     def get(self, pid):
         return self._tablePcb.get(pid)
 
-    def update(self, pcb, updState):
-        if self.runningPCB != None and pcb.pid == self.runningPCB.pid and updState != State.srunning:
-            self._running = None
-        pcb.state = updState
-        if updState == State.srunning:
-            self._running = pcb
-        if updState == State.sterminated:
-            self._tablePcb.pop(pcb.pid)
-        else:
-            self._tablePcb.update({pcb.pid: pcb})
-
     def update(self, pcb):
         self._tablePcb.update({pcb.pid: pcb})
 
@@ -297,23 +388,117 @@ class PcbTable():
     def table(self):
         return self._tablePcb
     
+    # running pcb of core 0
     @property
     def runningPCB(self):
-        return self._running
+        return self._running[0]
 
     @runningPCB.setter
     def runningPCB(self, pcb):
-        self._running = pcb
+        self._running[0] = pcb
+
+    def getRunning(self, core):
+        return self._running[core]
+
+    def setRunning(self, core, pcb):
+        self._running[core] = pcb
+
+    # running pcbs, in core order
+    @property
+    def runningPCBs(self):
+        return [pcb for pcb in self._running if pcb is not None]
+
+    # first core without a running pcb (None if all are busy)
+    def idleCore(self):
+        for core in range(0, len(self._running)):
+            if self._running[core] is None:
+                return core
+        return None
 
     def __repr__(self):
         return "PCBTable:\n {}".format(self._tablePcb)
 
 
-# pid counter
+# nearest rank percentile of a sorted list
+def percentile(values, percent):
+    if not values:
+        return 0
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+## scheduling metrics of the processes run by a kernel
+class SchedulingMetrics():
+
+    def __init__(self, kernel):
+        self._kernel = kernel
+        self._finished = [] # terminated pcbs
+        self._deadlines = 0 # jobs finished with a deadline
+        self._deadlineMisses = 0
+
+    def finished(self, pcb):
+        self._finished.append(pcb)
+        if pcb.deadline is not None:
+            self.jobDone(pcb, pcb.completion)
+
+    # a job with a deadline finished at tickNbr (every job of a periodic pcb)
+    def jobDone(self, pcb, tickNbr):
+        self._deadlines += 1
+        if tickNbr > pcb.deadline:
+            self._deadlineMisses += 1
+
+    @property
+    def finishedPCBs(self):
+        return self._finished
+
+    def _stats(self, values):
+        values = sorted(values)
+        average = sum(values) / len(values) if values else 0
+        return {'avg': average, 'p50': percentile(values, 50),
+                'p90': percentile(values, 90), 'p99': percentile(values, 99),
+                'max': values[-1] if values else 0}
+
+    # turnaround, waiting (ready) and response times of the finished
+    # processes, throughput and cpu utilization up to now
+    def report(self):
+        now = self._kernel.now()
+        pcbs = self._finished + list(self._kernel.pcbTable.table.values())
+        start = min([pcb.arrival for pcb in pcbs if pcb.arrival is not None], default = now)
+        elapsed = now - start
+        busy = sum(pcb.ticksIn(State.srunning, now) for pcb in pcbs)
+        cores = len(self._kernel.hardware.cores)
+        return {
+            'processes': len(pcbs),
+            'finished': len(self._finished),
+            'ticks': elapsed,
+            'turnaround': self._stats([pcb.completion - pcb.arrival for pcb in self._finished]),
+            'waiting': self._stats([pcb.ticksIn(State.sready) for pcb in self._finished]),
+            'response': self._stats([pcb.firstRun - pcb.arrival for pcb in self._finished]),
+            'throughput': len(self._finished) / elapsed if elapsed > 0 else 0,
+            'utilization': busy / (elapsed * cores) if elapsed > 0 else 0,
+            'deadlines': self._deadlines,
+            'deadlineMisses': self._deadlineMisses,
+        }
+
+    def __repr__(self):
+        report = self.report()
+        rows = [[name] + ['{:.2f}'.format(report[name][stat]) for stat in ['avg', 'p50', 'p90', 'p99', 'max']]
+                for name in ['turnaround', 'waiting', 'response']]
+        text = "{} {} of {} processes finished in {} ticks\n{}\nthroughput: {:.4f} processes/tick  cpu utilization: {:.1%}".format(
+                self._kernel.scheduler.name, report['finished'], report['processes'], report['ticks'],
+                tabulate(rows, ['ticks', 'avg', 'p50', 'p90', 'p99', 'max'], tablefmt='psql'),
+                report['throughput'], report['utilization'])
+        if report['deadlines']:
+            text += "\ndeadline misses: {} of {}".format(report['deadlineMisses'], report['deadlines'])
+        return text
+
+
+# pid counter (one per kernel)
 class pid():
-    number = 0
 
-    @classmethod
+    def __init__(self):
+        self.number = 0
+
     def new(self):
         self.number += 1
         return self.number
@@ -322,16 +507,212 @@ class pid():
 # emulate a pcb
 class ProcessControlBlock():
 
-    def __init__(self, programName, priority, pages = [], baseDir = 0):
-        self._pid = pid.new()
+    def __init__(self, pidNumber, programName, priority, pages = [], baseDir = 0):
+        self._pid = pidNumber
         self._baseDir = baseDir
         self._limit = 0
         self._pc  = 0 # TODO check if keep that
         self._state = State.snew
         # well knew cpu reset state
-        self._context = (0, 0, 0, -1, True) # keep sync with hardware#546
+        self._context = (0, 0, 0, -1, True, 0) # keep sync with Cpu.context
         self._path = programName
         self._priority = priority 
+        self._core = None # core where it runs (or last ran)
+        # accounting (ticks, see changeState)
+        self._arrival = None
+        self._firstRun = None
+        self._completion = None
+        self._since = None # tick of the last state change
+        self._enqueueTick = 0 # tick of the last add to a ready queue
+        self._burstTicks = 0 # ticks run in the current cpu burst
+        self._predictedBurst = None # see SchedulerSJF
+        self._vruntime = None # see SchedulerCFS
+        self._vruntimeTicks = 0 # running ticks accounted in vruntime
+        self._queueLevel = 0 # see SchedulerMLFQ
+        self._levelTicks = 0 # running ticks when it got to its level
+        self._boostEpoch = None
+        self._sharePass = None # see SchedulerStride
+        self._deadline = None # tick to finish by (real time)
+        self._relativeDeadline = None
+        self._worstCase = None # cpu ticks declared
+        self._period = None # ticks between releases (periodic real time)
+        self._release = None # tick of the release of the current job
+        self._jobsLeft = None # to release after the current one (None: forever)
+        self._shareTicks = 0 # running ticks accounted in sharePass
+        self._ticksIn = {state: 0 for state in State}
+
+    # state changes at tickNbr: the ticks since the previous change
+    # are accounted to the previous state
+    def changeState(self, state, tickNbr):
+        if self._since is None:
+            self._arrival = tickNbr
+        else:
+            self._ticksIn[self._state] += tickNbr - self._since
+            if self._state == State.srunning:
+                self._burstTicks += tickNbr - self._since
+        self._since = tickNbr
+        if state == State.srunning and self._firstRun is None:
+            self._firstRun = tickNbr
+        if state == State.sterminated:
+            self._completion = tickNbr
+        self._state = state
+
+    @property
+    def enqueueTick(self):
+        return self._enqueueTick
+
+    @enqueueTick.setter
+    def enqueueTick(self, tickNbr):
+        self._enqueueTick = tickNbr
+
+    # ticks run in the current cpu burst (up to tickNbr if running)
+    def burstTicks(self, tickNbr = None):
+        ticks = self._burstTicks
+        if self._state == State.srunning and tickNbr is not None:
+            ticks += tickNbr - self._since
+        return ticks
+
+    # the current cpu burst ended (io or exit), returns its ticks
+    def endBurst(self):
+        ticks = self._burstTicks
+        self._burstTicks = 0
+        return ticks
+
+    @property
+    def predictedBurst(self):
+        return self._predictedBurst
+
+    @predictedBurst.setter
+    def predictedBurst(self, ticks):
+        self._predictedBurst = ticks
+
+    @property
+    def vruntime(self):
+        return self._vruntime
+
+    @vruntime.setter
+    def vruntime(self, vruntime):
+        self._vruntime = vruntime
+
+    @property
+    def vruntimeTicks(self):
+        return self._vruntimeTicks
+
+    @vruntimeTicks.setter
+    def vruntimeTicks(self, ticks):
+        self._vruntimeTicks = ticks
+
+    @property
+    def queueLevel(self):
+        return self._queueLevel
+
+    @queueLevel.setter
+    def queueLevel(self, level):
+        self._queueLevel = level
+
+    @property
+    def levelTicks(self):
+        return self._levelTicks
+
+    @levelTicks.setter
+    def levelTicks(self, ticks):
+        self._levelTicks = ticks
+
+    @property
+    def boostEpoch(self):
+        return self._boostEpoch
+
+    @boostEpoch.setter
+    def boostEpoch(self, epoch):
+        self._boostEpoch = epoch
+
+    @property
+    def sharePass(self):
+        return self._sharePass
+
+    @sharePass.setter
+    def sharePass(self, value):
+        self._sharePass = value
+
+    @property
+    def shareTicks(self):
+        return self._shareTicks
+
+    @shareTicks.setter
+    def shareTicks(self, ticks):
+        self._shareTicks = ticks
+
+    # relative to tickNbr (None: not real time), a period releases
+    # a new job every period ticks, jobs times (None: forever)
+    def setDeadline(self, deadline, worstCase, tickNbr, period = None, jobs = None):
+        self._relativeDeadline = deadline
+        self._deadline = None if deadline is None else tickNbr + deadline
+        self._worstCase = worstCase
+        self._period = None if deadline is None else period
+        self._release = tickNbr
+        self._jobsLeft = None if jobs is None else jobs - 1
+
+    # the next job is released at tickNbr
+    def rearm(self, tickNbr):
+        self._release = tickNbr
+        self._deadline = tickNbr + self._relativeDeadline
+        if self._jobsLeft is not None:
+            self._jobsLeft -= 1
+
+    # periodic, with jobs to release after the current one
+    def hasNextJob(self):
+        return self._period is not None and (self._jobsLeft is None or self._jobsLeft > 0)
+
+    # the next job runs the program from the beginning
+    def restart(self):
+        self._context = (0, 0, 0, -1, True, 0) # keep sync with Cpu.context
+
+    @property
+    def period(self):
+        return self._period
+
+    @property
+    def nextRelease(self):
+        return self._release + self._period
+
+    @property
+    def deadline(self):
+        return self._deadline
+
+    @property
+    def relativeDeadline(self):
+        return self._relativeDeadline
+
+    @property
+    def worstCase(self):
+        return self._worstCase
+
+    @property
+    def arrival(self):
+        return self._arrival
+
+    @property
+    def firstRun(self):
+        return self._firstRun
+
+    @property
+    def completion(self):
+        return self._completion
+
+    # ticks spent in state (up to tickNbr for the current state)
+    def ticksIn(self, state, tickNbr = None):
+        ticks = self._ticksIn[state]
+        if state == self._state and tickNbr is not None and self._since is not None:
+            ticks += tickNbr - self._since
+        return ticks
+
+    @property
+    def core(self):
+        return self._core
+
+    @core.setter
+    def core(self, value):
+        self._core = value
 
     @property
     def context(self):
@@ -417,13 +798,10 @@ class Loader():
         programCode = self._fs.read(path)
         programSize = len(programCode.instructions)
         pagesToCreate = programSize // self._mm._frameSize
-        pages = []
 
         if (programSize % self._mm._frameSize > 0):
             pagesToCreate += 1
-        for x in range(0, pagesToCreate):
-            pages.append(Page(pid, x))
-        return pages
+        return PageTable(pid, pagesToCreate)
 
         
     def loadPage(self, pcb, page, pageId, frameId):
@@ -450,14 +828,120 @@ class Loader():
             	pageNumber = instAddr // self._mm._frameSize
             	physicalAddress = offset + frameId * self._mm._frameSize
             	inst = programCode.instructions[instAddr]
-            	self._mm.memory.put(physicalAddress, inst)
+            	self._mm.memory.put(physicalAddress, inst, programCode.decoded[instAddr])
+
+
 
+## priority levels of the processes (0 is the highest)
+PRIORITY_LEVELS = 5
+
+## ticks in a ready queue to go up one priority level
+AGING_TICKS = 8
+
+
+## ready queue with a fifo per priority level and a bitmap of the
+## non-empty levels (bit n: level n), add and pop are O(1)
+class MultiLevelQueue():
+
+    def __init__(self, levels = PRIORITY_LEVELS):
+        self._queues = [deque() for _ in range(levels)]
+        self._bitmap = 0
+        self._size = 0
+
+    @property
+    def levels(self):
+        return len(self._queues)
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pcb, level):
+        self._queues[level].append(pcb)
+        self._bitmap |= 1 << level
+        self._size += 1
+
+    # the non-empty levels, from the highest priority
+    def nonEmpty(self):
+        bitmap = self._bitmap
+        while bitmap:
+            bit = bitmap & -bitmap
+            yield bit.bit_length() - 1
+            bitmap ^= bit
+
+    # the oldest pcb of a non-empty level
+    def first(self, level):
+        return self._queues[level][0]
+
+    def levelSize(self, level):
+        return len(self._queues[level])
+
+    # prec: the level is not empty
+    def pop(self, level):
+        queue = self._queues[level]
+        pcb = queue.popleft()
+        if not queue:
+            self._bitmap &= ~(1 << level)
+        self._size -= 1
+        return pcb
+
+    def __repr__(self):
+        return "\n".join("{}{}".format(level, list(queue)) for (level, queue) in enumerate(self._queues))
 
 
 class AbstractScheduler():
 
+    _levels = PRIORITY_LEVELS
+    _clock = None
+
+    # the clock of the machine (set by the kernel)
+    @property
+    def clock(self):
+        return self._clock
+
+    @clock.setter
+    def clock(self, clock):
+        self._clock = clock
+
+    def now(self):
+        return 0 if self._clock is None else self._clock.currentTick
+
+    # a cpu burst of pcb ended (io or exit) after ticks
+    def burstEnded(self, pcb, ticks):
+        pass
+
+    # the quantum of pcb about to run (None: the quantum of the timer)
+    def timeslice(self, pcb):
+        return None
+
+    # timeslice gives the quantum
+    @property
+    def hasTimeslice(self):
+        return False
+
+    # pcb used up its quantum
+    def expired(self, pcb):
+        pass
+
+    # can pcb run with its deadline along with the real time pcbs
+    # admitted? (the others ignore it)
+    def admit(self, pcb, admitted, cores = 1):
+        return True
+
+    # the scheduler of another core of a multi-core machine
+    def forCore(self, core):
+        return copy.deepcopy(self)
+
+    # the running pcb to expropiate among candidates (the ones that
+    # mustExpropiate accepts, in core order): the worst one
+    def victim(self, candidates):
+        return candidates[0]
+
+    # pcb used up its quantum but it goes on running (prec: hasNext)
+    def keepsRunning(self, pcb):
+        return False
+
     def emptyReadyQueue(self):
-        return []
+        return deque()
 
     @property
     def readyQueue(self):
@@ -467,96 +951,70 @@ class AbstractScheduler():
     def name(self):
         return self._name
 
+    # priorities go from 0 to levels - 1
+    @property
+    def levels(self):
+        return self._levels
+
     def __repr__(self):
-        return "{}\n {}".format(self._name, self._readyQueue)
+        return "{}\n {}".format(self._name, list(self._readyQueue))
 
 
 class SchedulerNonPreemtive(AbstractScheduler):
 
-    def __init__(self):
+    def __init__(self, levels = PRIORITY_LEVELS, agingTicks = AGING_TICKS):
         self._name = "Non Preemtive"
-        self._cantE = 0
-        self._ageReset = 1
-        self._ageCount = self._ageReset
-        self._readyQueue0 = self.emptyReadyQueue()
-        self._readyQueue1 = self.emptyReadyQueue()
-        self._readyQueue2 = self.emptyReadyQueue()
-        self._readyQueue3 = self.emptyReadyQueue()
-        self._readyQueue4 = self.emptyReadyQueue()
+        self._levels = levels
+        self._agingTicks = agingTicks
+        self._readyQueue = MultiLevelQueue(levels)
+
+    @property
+    def agingTicks(self):
+        return self._agingTicks
 
     def add(self, pcb):
-        self._cantE += 1
-        if pcb.priority == 0 :
-            self._readyQueue0.insert(0, pcb)
-        elif pcb.priority == 1 :
-            self._readyQueue1.insert(0, pcb)
-        elif pcb.priority == 2 :
-            self._readyQueue2.insert(0, pcb)
-        elif pcb.priority == 3 :
-            self._readyQueue3.insert(0, pcb)
-        elif pcb.priority == 4 :
-            self._readyQueue4.insert(0, pcb)
+        pcb.enqueueTick = self.now()
+        self._readyQueue.add(pcb, pcb.priority)
+
+    # aging: a pcb goes up one level every agingTicks in the queue
+    def effectivePriority(self, pcb, now):
+        return max(0, pcb.priority - (now - pcb.enqueueTick) // self._agingTicks)
 
     # prec: hay al menos un pcb en el queue
+    # the oldest pcb of a level has its best effective priority, so
+    # only the first pcb of each level is a candidate
     def getNext(self):
-        self._cantE -= 1
-        self._ageCount -= 1
-        if self._shouldIAging():
-             self._aging()
-        if self._readyQueue0 :
-            return self._readyQueue0.pop()
-        elif self._readyQueue1 : 
-            return self._readyQueue1.pop()
-        elif self._readyQueue2 :
-            return self._readyQueue2.pop()
-        elif self._readyQueue3 :
-            return self._readyQueue3.pop()
-        elif self._readyQueue4 :
-            return self._readyQueue4.pop()
-
-    def _shouldIAging(self):
-        return self._ageCount == 0
-
-    def _aging(self):
-        self._ageCount = self._ageReset
-        if self._readyQueue4 :
-            self._readyQueue3.insert(0,
-                                     self._readyQueue4.pop())
-        elif self._readyQueue3 and not(self._readyQueue4): 
-            self._readyQueue2.insert(0, 
-                                     self._readyQueue3.pop())
-        elif self._readyQueue2 and not(self._readyQueue3):
-            self._readyQueue1.insert(0, 
-                                     self._readyQueue2.pop())
-        elif self._readyQueue1 and not(self._readyQueue2):
-            self._readyQueue0.insert(0, 
-                                     self._readyQueue1.pop())
+        now = self.now()
+        best = None
+        for level in self._readyQueue.nonEmpty():
+            pcb = self._readyQueue.first(level)
+            key = (self.effectivePriority(pcb, now), pcb.enqueueTick)
+            if best is None or key < bestKey:
+                (best, bestKey) = (level, key)
+        return self._readyQueue.pop(best)
 
     def hasNext(self):
-        return self._cantE > 0
+        return len(self._readyQueue) > 0
 
     def mustExpropiate(self, pcb1, pcb2):
         return False        
 
     def __repr__(self):
-        return "Scheduler readyQueue {}\n0{}\n1{}\n2{}\n3{}\n4{}".format(
-                self._name
-                ,self._readyQueue0
-                ,self._readyQueue1
-                ,self._readyQueue2
-                ,self._readyQueue3
-                ,self._readyQueue4
-                )
+        return "Scheduler readyQueue {}\n{}".format(self._name, self._readyQueue)
 
 
 class SchedulerPreemtive(SchedulerNonPreemtive):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, levels = PRIORITY_LEVELS, agingTicks = AGING_TICKS):
+        super().__init__(levels, agingTicks)
         self._name = "Preemtive"
 
     def mustExpropiate (self, pcbrunning, pcbready):
         return pcbrunning.priority > pcbready.priority
+
+    # the lowest priority
+    def victim(self, candidates):
+        return max(candidates, key = lambda pcb: pcb.priority)
   
 class SchedulerFCFS(AbstractScheduler):
 
@@ -565,10 +1023,10 @@ class SchedulerFCFS(AbstractScheduler):
         self._readyQueue = self.emptyReadyQueue()
 
     def add(self, pcb):
-        self._readyQueue.insert(0, pcb) #.insert(0, x) is O(n)
+        self._readyQueue.append(pcb)
 
     def getNext(self):
-        return self._readyQueue.pop() #.pop(0) is O(n)
+        return self._readyQueue.popleft()
 
     def hasNext(self):
         return  self._readyQueue
@@ -580,13 +1038,153 @@ class SchedulerRRB(AbstractScheduler):
 
     def __init__(self):
         self._name = "Round Robin"
-        self._readyQueue = []
+        self._readyQueue = self.emptyReadyQueue()
+
+    def add(self, pcb):
+        self._readyQueue.append(pcb)
+
+    def getNext(self):
+        return self._readyQueue.popleft()
+
+    def hasNext(self):
+        return self._readyQueue
+
+    def mustExpropiate(self, pcb1, pcb2):
+        return False
+
+## predicted ticks of the first cpu burst of a process
+INITIAL_BURST = 4
+
+## weight of the last burst in the prediction of the next one
+BURST_ALPHA = 0.5
+
+
+## shortest job first: the next pcb is the one with the shortest
+## predicted cpu burst, predicted by exponential averaging of the
+## previous bursts of the process
+class SchedulerSJF(AbstractScheduler):
+
+    def __init__(self, alpha = BURST_ALPHA, initialBurst = INITIAL_BURST):
+        self._name = "Shortest Job First"
+        self._alpha = alpha
+        self._initialBurst = initialBurst
+        self._readyQueue = [] # heap of (key, order, pcb)
+        self._order = 0 # fifo between equal keys
+        self._bursts = 0
+        self._predictionError = 0
+
+    def predictedBurst(self, pcb):
+        if pcb.predictedBurst is None:
+            return self._initialBurst
+        return pcb.predictedBurst
+
+    def key(self, pcb):
+        return self.predictedBurst(pcb)
+
+    def add(self, pcb):
+        self._order += 1
+        heapq.heappush(self._readyQueue, (self.key(pcb), self._order, pcb))
+
+    def getNext(self):
+        return heapq.heappop(self._readyQueue)[2]
+
+    def hasNext(self):
+        return self._readyQueue
+
+    def mustExpropiate(self, pcb1, pcb2):
+        return False
+
+    def burstEnded(self, pcb, ticks):
+        predicted = self.predictedBurst(pcb)
+        self._bursts += 1
+        self._predictionError += abs(predicted - ticks)
+        pcb.predictedBurst = self._alpha * ticks + (1 - self._alpha) * predicted
+
+    # mean absolute error of the predictions of the ended bursts
+    @property
+    def predictionError(self):
+        return self._predictionError / self._bursts if self._bursts else 0
+
+    def __repr__(self):
+        return "{} (prediction error {:.2f} ticks in {} bursts)\n {}".format(
+                self._name, self.predictionError, self._bursts,
+                [pcb for (key, order, pcb) in sorted(self._readyQueue)])
+
+
+## shortest remaining time first: preemptive SJF, a pcb that gets ready
+## expropiates the running one if its predicted burst is shorter than
+## the predicted remaining time of the running one
+class SchedulerSRTF(SchedulerSJF):
+
+    def __init__(self, alpha = BURST_ALPHA, initialBurst = INITIAL_BURST):
+        super().__init__(alpha, initialBurst)
+        self._name = "Shortest Remaining Time First"
+
+    def remaining(self, pcb, tickNbr = None):
+        return max(0, self.predictedBurst(pcb) - pcb.burstTicks(tickNbr))
+
+    def key(self, pcb):
+        return self.remaining(pcb)
+
+    def mustExpropiate(self, pcbrunning, pcbready):
+        return self.remaining(pcbrunning, self.now()) > self.remaining(pcbready)
+
+    # the longest remaining time
+    def victim(self, candidates):
+        now = self.now()
+        return max(candidates, key = lambda pcb: self.remaining(pcb, now))
+
+
+## weight of a priority 0 process (see SchedulerCFS)
+CFS_WEIGHT = 1024
+
+## ticks in which every runnable process should run once
+CFS_LATENCY = 24
+
+## minimum timeslice
+CFS_MIN_TIMESLICE = 2
+
+
+## completely fair: the next pcb is the one with the least virtual
+## runtime, its running ticks scaled by the weight of its priority
+## (each priority level gets 1.25 times the cpu of the next one)
+## The timeslice is the share of CFS_LATENCY of the pcb among the
+## runnable ones
+class SchedulerCFS(AbstractScheduler):
+
+    def __init__(self, latency = CFS_LATENCY, minTimeslice = CFS_MIN_TIMESLICE):
+        self._name = "Completely Fair"
+        self._latency = latency
+        self._minTimeslice = minTimeslice
+        self._readyQueue = [] # heap of (vruntime, order, pcb)
+        self._order = 0 # fifo between equal vruntimes
+        self._weights = 0 # sum of the weights of the ready pcbs
+        self._minVruntime = 0 # never decreases
+
+    def weight(self, pcb):
+        return int(CFS_WEIGHT / 1.25 ** pcb.priority)
+
+    # adds the running ticks not accounted yet to the vruntime of pcb
+    def updateVruntime(self, pcb):
+        ticks = pcb.ticksIn(State.srunning)
+        if pcb.vruntime is None:
+            pcb.vruntime = self._minVruntime
+        pcb.vruntime += (ticks - pcb.vruntimeTicks) * CFS_WEIGHT / self.weight(pcb)
+        pcb.vruntimeTicks = ticks
+        # new and waken up pcbs do not get credit for the time away
+        pcb.vruntime = max(pcb.vruntime, self._minVruntime)
 
     def add(self, pcb):
-        self._readyQueue.insert(0, pcb)
+        self.updateVruntime(pcb)
+        self._order += 1
+        self._weights += self.weight(pcb)
+        heapq.heappush(self._readyQueue, (pcb.vruntime, self._order, pcb))
 
     def getNext(self):
-        return self._readyQueue.pop() #.pop(0) is O(n)
+        (vruntime, order, pcb) = heapq.heappop(self._readyQueue)
+        self._weights -= self.weight(pcb)
+        self._minVruntime = max(self._minVruntime, vruntime)
+        return pcb
 
     def hasNext(self):
         return self._readyQueue
@@ -594,35 +1192,568 @@ class SchedulerRRB(AbstractScheduler):
     def mustExpropiate(self, pcb1, pcb2):
         return False
 
+    @property
+    def hasTimeslice(self):
+        return True
+
+    def timeslice(self, pcb):
+        weight = self.weight(pcb)
+        share = self._latency * weight // (self._weights + weight)
+        return max(self._minTimeslice, share)
+
+    def __repr__(self):
+        return "{} (min vruntime {:.2f})\n {}".format(self._name, self._minVruntime,
+                ["{} {:.2f}".format(pcb.pid, vruntime) for (vruntime, order, pcb) in sorted(self._readyQueue)])
+
+
+## quantum of each level of the multilevel feedback queue
+MLFQ_QUANTUMS = (2, 4, 8, 16)
+
+## ticks between boosts of every process to the first level
+MLFQ_BOOST_TICKS = 64
+
+
+## multilevel feedback queue: a round robin per level, each one with its
+## own quantum. A pcb that uses up the quantum of its level (in one or
+## more dispatches) goes down one level, one that blocks on io before
+## goes up one. Every boostTicks all the pcbs
+## go back to the first level (lazily: a pcb whose level was set before
+## the current boost epoch is at the first level)
+class SchedulerMLFQ(AbstractScheduler):
+
+    def __init__(self, quantums = MLFQ_QUANTUMS, boostTicks = MLFQ_BOOST_TICKS):
+        self._name = "Multilevel Feedback Queue"
+        self._quantums = list(quantums)
+        self._boostTicks = boostTicks
+        self._readyQueue = MultiLevelQueue(len(self._quantums))
+        self._epoch = 0 # boost epoch of the levels in the ready queue
+
+    @property
+    def quantums(self):
+        return self._quantums
+
+    def epoch(self):
+        return self.now() // self._boostTicks
+
+    def level(self, pcb):
+        if pcb.boostEpoch != self.epoch():
+            return 0
+        return pcb.queueLevel
+
+    def setLevel(self, pcb, level):
+        pcb.queueLevel = level
+        pcb.levelTicks = pcb.ticksIn(State.srunning, self.now())
+        pcb.boostEpoch = self.epoch()
+
+    # a new boost epoch: the ready pcbs go to the first level, in level order
+    def boost(self):
+        epoch = self.epoch()
+        if epoch != self._epoch:
+            self._epoch = epoch
+            for level in list(self._readyQueue.nonEmpty()):
+                while level > 0 and self._readyQueue.levelSize(level):
+                    self._readyQueue.add(self._readyQueue.pop(level), 0)
+
+    def add(self, pcb):
+        self.boost()
+        self._readyQueue.add(pcb, self.level(pcb))
+
+    def getNext(self):
+        self.boost()
+        return self._readyQueue.pop(next(self._readyQueue.nonEmpty()))
+
+    def hasNext(self):
+        return len(self._readyQueue) > 0
+
+    def mustExpropiate(self, pcbrunning, pcbready):
+        return self.level(pcbready) < self.level(pcbrunning)
+
+    # the lowest level
+    def victim(self, candidates):
+        return max(candidates, key = self.level)
+
+    def expired(self, pcb):
+        self.setLevel(pcb, min(self.level(pcb) + 1, len(self._quantums) - 1))
+
+    def burstEnded(self, pcb, ticks):
+        self.setLevel(pcb, max(self.level(pcb) - 1, 0))
+
+    @property
+    def hasTimeslice(self):
+        return True
+
+    # what is left of the quantum of its level
+    def timeslice(self, pcb):
+        if pcb.boostEpoch != self.epoch():
+            return self._quantums[0]
+        used = pcb.ticksIn(State.srunning, self.now()) - pcb.levelTicks
+        return max(1, self._quantums[pcb.queueLevel] - used)
+
+    def __repr__(self):
+        return "Scheduler readyQueue {}\n{}".format(self._name, self._readyQueue)
+
+
+## tickets of the processes of each priority (proportional share)
+SHARE_TICKETS = (500, 400, 300, 200, 100)
+
+## pass of a process with one ticket after one tick (stride)
+STRIDE1 = 1 << 20
+
+
+## proportional share: each pcb gets cpu in proportion to the tickets
+## of its priority (use it with the timer quantum, like round robin)
+class AbstractShareScheduler(AbstractScheduler):
+
+    def __init__(self, tickets = SHARE_TICKETS):
+        self._tickets = list(tickets)
+        self._levels = len(self._tickets)
+
+    def tickets(self, pcb):
+        return self._tickets[pcb.priority]
+
+    def mustExpropiate(self, pcb1, pcb2):
+        return False
+
+    # pid -> (target share, actual share) of the cpu run by pcbs up to tickNbr
+    def shares(self, pcbs, tickNbr):
+        tickets = sum(self.tickets(pcb) for pcb in pcbs)
+        ticks = sum(pcb.ticksIn(State.srunning, tickNbr) for pcb in pcbs)
+        return {pcb.pid: (self.tickets(pcb) / tickets, pcb.ticksIn(State.srunning, tickNbr) / ticks if ticks else 0)
+                for pcb in pcbs}
+
+
+## stride: the next pcb is the one with the least pass, the pass
+## goes up STRIDE1 / tickets for each tick run (deterministic)
+class SchedulerStride(AbstractShareScheduler):
+
+    def __init__(self, tickets = SHARE_TICKETS):
+        super().__init__(tickets)
+        self._name = "Stride"
+        self._readyQueue = [] # heap of (pass, order, pcb)
+        self._order = 0 # fifo between equal passes
+        self._minPass = 0 # never decreases
+
+    def add(self, pcb):
+        ticks = pcb.ticksIn(State.srunning)
+        if pcb.sharePass is None:
+            pcb.sharePass = self._minPass
+        pcb.sharePass += (ticks - pcb.shareTicks) * STRIDE1 // self.tickets(pcb)
+        pcb.shareTicks = ticks
+        # new and waken up pcbs do not get credit for the time away
+        pcb.sharePass = max(pcb.sharePass, self._minPass)
+        self._order += 1
+        heapq.heappush(self._readyQueue, (pcb.sharePass, self._order, pcb))
+
+    def getNext(self):
+        (sharePass, order, pcb) = heapq.heappop(self._readyQueue)
+        self._minPass = max(self._minPass, sharePass)
+        return pcb
+
+    def hasNext(self):
+        return self._readyQueue
+
+    def __repr__(self):
+        return "{}\n {}".format(self._name,
+                ["{} {}".format(pcb.pid, sharePass) for (sharePass, order, pcb) in sorted(self._readyQueue)])
+
+
+## a Fenwick (binary indexed) tree of the tickets of the ready pcbs,
+## one slot per pcb: add and draw are O(log n)
+class TicketTree():
+
+    def __init__(self, size = 16):
+        self._tree = [0] * (size + 1) # 1 based
+        self._slots = [None] * size # (pcb, tickets)
+        self._free = list(range(size - 1, -1, -1)) # free slots, lowest last
+        self._total = 0
+
+    @property
+    def total(self):
+        return self._total
+
+    def __len__(self):
+        return len(self._slots) - len(self._free)
+
+    def _update(self, slot, tickets):
+        index = slot + 1
+        while index < len(self._tree):
+            self._tree[index] += tickets
+            index += index & -index
+        self._total += tickets
+
+    # every slot is taken: doubles them, the tree is built again
+    def _grow(self):
+        slots = self._slots
+        self.__init__(len(slots) * 2)
+        self._free = self._free[:len(slots)]
+        for (slot, (pcb, tickets)) in enumerate(slots):
+            self._slots[slot] = (pcb, tickets)
+            self._update(slot, tickets)
+
+    def add(self, pcb, tickets):
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self._slots[slot] = (pcb, tickets)
+        self._update(slot, tickets)
+
+    # the pcb holding the winning ticket, removed from the tree
+    # prec: 0 <= ticket < total
+    def draw(self, ticket):
+        index = 0 # the tickets of the slots before index are <= ticket
+        bit = 1 << (len(self._tree) - 1).bit_length()
+        while bit:
+            if index + bit < len(self._tree) and self._tree[index + bit] <= ticket:
+                index += bit
+                ticket -= self._tree[index]
+            bit >>= 1
+        (pcb, tickets) = self._slots[index]
+        self._slots[index] = None
+        self._free.append(index)
+        self._update(index, -tickets)
+        return pcb
+
+    def pcbs(self):
+        return [slot[0] for slot in self._slots if slot is not None]
+
+
+## lottery: the next pcb is the holder of a random ticket among the
+## tickets of the ready pcbs (seeded, so runs can be repeated)
+class SchedulerLottery(AbstractShareScheduler):
+
+    def __init__(self, tickets = SHARE_TICKETS, seed = 0):
+        super().__init__(tickets)
+        self._name = "Lottery"
+        self._seed = seed
+        self._random = random.Random(seed)
+        self._readyQueue = TicketTree()
+        self._ticket = None # drawn by keepsRunning for getNext
+
+    # every core draws its own tickets (seed + core)
+    def forCore(self, core):
+        scheduler = copy.deepcopy(self)
+        scheduler._seed = self._seed + core
+        scheduler._random = random.Random(scheduler._seed)
+        return scheduler
+
+    def add(self, pcb):
+        self._readyQueue.add(pcb, self.tickets(pcb))
+
+    def getNext(self):
+        ticket = self._ticket
+        self._ticket = None
+        if ticket is None:
+            ticket = self._random.randrange(self._readyQueue.total)
+        return self._readyQueue.draw(ticket)
+
+    # the tickets of the running pcb are in the draw too, it goes on
+    # running if it wins
+    def keepsRunning(self, pcb):
+        ticket = self._random.randrange(self._readyQueue.total + self.tickets(pcb))
+        if ticket >= self._readyQueue.total:
+            return True
+        self._ticket = ticket
+        return False
+
+    def hasNext(self):
+        return len(self._readyQueue) > 0
+
+    def __repr__(self):
+        return "{} ({} tickets)\n {}".format(self._name, self._readyQueue.total, self._readyQueue.pcbs())
+
+
+## earliest deadline first: the pcbs with a deadline (real time) run
+## before the others, the one with the earliest deadline first, and
+## expropiate a running pcb with a later deadline or without one. The
+## others (background) run first come first served.
+## Admission control: the density (worst case / relative deadline, or
+## period if shorter) of the live real time pcbs must not exceed the cores
+class SchedulerEDF(AbstractScheduler):
+
+    def __init__(self):
+        self._name = "Earliest Deadline First"
+        self._realTime = [] # heap of (deadline, order, pcb)
+        self._order = 0 # fifo between equal deadlines
+        self._readyQueue = self.emptyReadyQueue() # background
+
+    # fraction of a cpu that pcb needs
+    def density(self, pcb):
+        if pcb.period is None:
+            return pcb.worstCase / pcb.relativeDeadline
+        return pcb.worstCase / min(pcb.relativeDeadline, pcb.period)
+
+    def admit(self, pcb, admitted, cores = 1):
+        if pcb.relativeDeadline <= 0 or (pcb.period is not None and pcb.period <= 0):
+            return False
+        return sum(self.density(other) for other in admitted) + self.density(pcb) <= cores
+
+    def add(self, pcb):
+        if pcb.deadline is None:
+            self._readyQueue.append(pcb)
+        else:
+            self._order += 1
+            heapq.heappush(self._realTime, (pcb.deadline, self._order, pcb))
+
+    def getNext(self):
+        if self._realTime:
+            return heapq.heappop(self._realTime)[2]
+        return self._readyQueue.popleft()
+
+    def hasNext(self):
+        return self._realTime or self._readyQueue
+
+    def mustExpropiate(self, pcbrunning, pcbready):
+        if pcbready.deadline is None:
+            return False
+        return pcbrunning.deadline is None or pcbready.deadline < pcbrunning.deadline
+
+    # a background pcb, else the latest deadline
+    def victim(self, candidates):
+        return max(candidates, key = lambda pcb: (pcb.deadline is None, pcb.deadline or 0))
+
+    def __repr__(self):
+        return "{}\n real time {}\n background {}".format(self._name,
+                ["{} {}".format(pcb.pid, deadline) for (deadline, order, pcb) in sorted(self._realTime)],
+                list(self._readyQueue))
+
+
+# one ready queue (scheduler) per core; idle cores steal from the busiest one
+class MultiCoreScheduler():
+
+    def __init__(self, scheduler, cores = 1):
+        self._schedulers = [scheduler] + [scheduler.forCore(core) for core in range(1, cores)]
+        self._counts = [0] * cores # pcbs in each ready queue
+        self._admitted = [] # real time pcbs, of every core
+        self._rejected = 0
+
+    # pcbs go back to the core they ran on (affinity) or to the least loaded one
+    def add(self, pcb):
+        core = pcb.core
+        if core is None:
+            core = self._counts.index(min(self._counts))
+        self._counts[core] += 1
+        self._schedulers[core].add(pcb)
+
+    # prec: hasNext(core)
+    def getNext(self, core = 0):
+        if not self._schedulers[core].hasNext():
+            core = self._counts.index(max(self._counts)) # work stealing
+        self._counts[core] -= 1
+        return self._schedulers[core].getNext()
+
+    def hasNext(self, core = 0):
+        return self._schedulers[core].hasNext() or max(self._counts) > 0
+
+    # asks the scheduler of the core of the running pcb
+    def mustExpropiate(self, pcbrunning, pcbready):
+        return self._schedulers[pcbrunning.core or 0].mustExpropiate(pcbrunning, pcbready)
+
+    # the running pcbs of every core compete (the order is the same in
+    # every core, they have the same kind of scheduler)
+    def victim(self, candidates):
+        return self._schedulers[0].victim(candidates)
+
+    def burstEnded(self, pcb, ticks):
+        self._schedulers[pcb.core or 0].burstEnded(pcb, ticks)
+
+    def timeslice(self, pcb, core = 0):
+        return self._schedulers[core].timeslice(pcb)
+
+    def expired(self, pcb):
+        self._schedulers[pcb.core].expired(pcb)
+
+    def keepsRunning(self, pcb):
+        return self._schedulers[pcb.core].keepsRunning(pcb)
+
+    # admission for all the cores (a pcb released again is admitted again)
+    def admit(self, pcb):
+        self._admitted = [other for other in self._admitted
+                          if other.state != State.sterminated and other is not pcb]
+        if self._schedulers[0].admit(pcb, self._admitted, len(self._schedulers)):
+            self._admitted.append(pcb)
+            return True
+        self._rejected += 1
+        return False
+
+    @property
+    def admitted(self):
+        return self._admitted
+
+    @property
+    def rejected(self):
+        return self._rejected
+
+    @property
+    def hasTimeslice(self):
+        return self._schedulers[0].hasTimeslice
+
+    @property
+    def schedulers(self):
+        return self._schedulers
+
+    @property
+    def name(self):
+        return self._schedulers[0].name
+
+    @property
+    def levels(self):
+        return self._schedulers[0].levels
+
+    @property
+    def clock(self):
+        return self._schedulers[0].clock
+
+    @clock.setter
+    def clock(self, clock):
+        for scheduler in self._schedulers:
+            scheduler.clock = clock
+
+    def __repr__(self):
+        if len(self._schedulers) == 1:
+            text = repr(self._schedulers[0])
+        else:
+            text = "\n".join("core {} {}".format(core, scheduler) for (core, scheduler) in enumerate(self._schedulers))
+        if self._admitted or self._rejected:
+            text += "\n{} real time admitted, {} rejected".format(len(self._admitted), self._rejected)
+        return text
+
+## characters of the states in the gantt chart
+GANTT_CHARS = {
+    State.srunning.value   : "\x9B7mR\x9B0m",
+    State.sready.value     : "r",
+    State.swaiting.value   : "w",
+    State.snew.value       : "n",
+    State.sterminated.value: ".",
+    }
+
+
+## a row of the gantt chart: the states of a pcb from tick first,
+## run-length encoded (one byte per run of ticks in the same state)
+class GanttRow():
+
+    def __init__(self, pid, priority, first):
+        self._pid = pid
+        self._priority = priority
+        self._first = first
+        self._states = bytearray()  # state of each run
+        self._starts = array('L')   # first tick of each run
+        self._end = first           # tick after the last one recorded
+
+    @property
+    def pid(self):
+        return self._pid
+
+    @property
+    def priority(self):
+        return self._priority
+
+    @property
+    def runs(self):
+        return len(self._states)
+
+    def add(self, state, count):
+        if not self._states or self._states[-1] != state:
+            self._states.append(state)
+            self._starts.append(self._end)
+        self._end += count
+
+    # the cells of ticks first..last-1 (blank outside of the row)
+    def cells(self, first, last):
+        text = " " * max(0, min(self._first, last) - first)
+        tick = max(first, self._first)
+        run = bisect_right(self._starts, tick) - 1
+        while tick < min(last, self._end):
+            runEnd = self._starts[run + 1] if run + 1 < len(self._starts) else self._end
+            count = min(runEnd, last) - tick
+            text += GANTT_CHARS[self._states[run]] * count
+            tick += count
+            run += 1
+        return text
+
+
+## clock subscriber that releases the next job of the periodic pcbs
+## waiting for it (an event at each release, see EventQueue)
+class PeriodicReleases():
+
+    def __init__(self, kernel):
+        self._kernel = kernel
+        self._kernel.dispacher.addSubscriber(self)
+        self._releases = [] # heap of (tick, pid, pcb)
+
+    def __len__(self):
+        return len(self._releases)
+
+    # pcb waits for its next release (the next tick if it is late)
+    def add(self, pcb):
+        heapq.heappush(self._releases, (pcb.nextRelease, pcb.pid, pcb))
+        events = self._kernel.hardware.clock.events
+        events.schedule(max(1, pcb.nextRelease - events.current))
+
+    def tick(self, tickNbr):
+        while self._releases and self._releases[0][0] <= tickNbr:
+            (tick, pid, pcb) = heapq.heappop(self._releases)
+            releaseIRQ = IRQ(RELEASE_INTERRUPTION_TYPE, pcb)
+            self._kernel.hardware.interruptVector.handle(releaseIRQ)
+
+    # no release in skipped ticks (see quietTicks)
+    def skipTicks(self, tickNbr, count):
+        pass
+
+    def quietTicks(self):
+        if self._releases:
+            return max(0, self._releases[0][0] - self._kernel.now())
+        return float('inf')
+
+    def __repr__(self):
+        return "releases {}".format([(tick, pid) for (tick, pid, pcb) in sorted(self._releases)])
+
+
+## records the state of every pcb in every tick (constant cost per tick),
+## the chart is rendered on request (see render)
 class Gantt():
 
     def __init__(self, kernel):
         self._kernel = kernel
         self._kernel.dispacher.addSubscriber(self)
         self._ticks = -1
-        self._graph = dict()
+        self._rows = dict() # pid -> GanttRow
 
     def ticks(self):
         return self._ticks
 
     def tick(self, tickNbr):
-        self._ticks += 1
-        g = ""
-        for (i, pcb)  in self._kernel.pcbTable.table.items():
-            if pcb.pid not in self._graph:
-                self._graph[pcb.pid] = "{}   {}    {}".format(pcb.pid, pcb.priority, " " * self._ticks)
-
-
-            case = {State.srunning   : "\x9B7mR\x9B0m", 
-                    State.sready     : "r",
-                    State.swaiting   : "w",
-                    State.snew       : "n",
-                    State.sterminated: "."}
-            self._graph[pcb.pid] += case[pcb.state]
-
-        log.logger.info("Gantt {} {}\npid prio (R)unning (r)eady (w)aiting".format(self._kernel._scheduler.name, self._ticks))
-        for (i, string) in self._graph.items():
-            log.logger.info(string)
+        self.skipTicks(tickNbr, 1)
+
+    # count ticks without state changes
+    def skipTicks(self, tickNbr, count):
+        first = self._ticks + 1
+        self._ticks += count
+        for pcb in self._kernel.pcbTable.table.values():
+            row = self._rows.get(pcb.pid)
+            if row is None:
+                row = GanttRow(pcb.pid, pcb.priority, first)
+                self._rows[pcb.pid] = row
+            row.add(pcb.state.value, count)
+
+    def quietTicks(self):
+        return float('inf')
+
+    @property
+    def rows(self):
+        return self._rows
+
+    # chart of ticks first..last-1 (up to the last tick if last is None)
+    # of the pids given (all if None)
+    def render(self, first = 0, last = None, pids = None):
+        last = self._ticks + 1 if last is None else last
+        lines = ["Gantt {} {}\npid prio (R)unning (r)eady (w)aiting".format(self._kernel.scheduler.name, self._ticks)]
+        for (pid, row) in self._rows.items():
+            if pids is None or pid in pids:
+                lines.append("{}   {}    {}".format(pid, row.priority, row.cells(first, last)))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return self.render()
   
 
 # file system basico
@@ -660,84 +1791,282 @@ class SwapMemory:
 
 
 
+## flags of a page table entry, the frame number goes in the bits above
+PTE_VALID       = 1
+PTE_DIRTY       = 2
+PTE_REFERENCED  = 4 # the chance of SecondChance
+PTE_FRAME_SHIFT = 3
+
+# flags byte -> 1 if valid, 0 if not (see PageTable.validMask)
+PTE_VALID_BYTES = bytes(flags & PTE_VALID for flags in range(256))
+
+
+## page table of a process: a packed int per page in a typed array
+## (4 bytes per page). Indexing it gives a Page, a view of the entry
+class PageTable():
+
+    def __init__(self, pid, pageCount):
+        self._pid = pid
+        self._entries = array('I', [PTE_REFERENCED]) * pageCount
+
+    @property
+    def pid(self):
+        return self._pid
+
+    @property
+    def entries(self):
+        return self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, number):
+        if not 0 <= number < len(self._entries):
+            raise IndexError("page {} of pid {} out of range".format(number, self._pid))
+        return Page(self, number)
+
+    # copies the entry of page
+    def __setitem__(self, number, page):
+        self._entries[number] = page.entry
+
+    def __iter__(self):
+        return (Page(self, number) for number in range(0, len(self._entries)))
+
+    # a byte per page, 1 if it is in memory. The flags are in the low
+    # byte of each entry: the scan is a slice and a translate of the
+    # bytes of the array, no python loop
+    def validMask(self):
+        size = self._entries.itemsize
+        low = 0 if sys.byteorder == 'little' else size - 1
+        return memoryview(self._entries).cast('B')[low::size].tobytes().translate(PTE_VALID_BYTES)
+
+    # numbers of the pages in memory
+    def validPages(self):
+        return list(compress(range(0, len(self._entries)), self.validMask()))
+
+    def validCount(self):
+        return self.validMask().count(1)
+
+    @property
+    def bytes(self):
+        return self._entries.itemsize * len(self._entries)
+
+    def __repr__(self):
+        return "PageTable pid {} ({} pages, {} valid)".format(self._pid, len(self), self.validCount())
+
+
+## a page table entry
 class Page:
     
-    def __init__(self, pid, number):
-        self._frame = None
-        self._dirty = False
-        self._chance = 1
-        self._validBit = False
-        self._pid = pid
+    def __init__(self, pageTable, number):
+        self._table = pageTable
         self._number = number
 
     def __repr__(self):
-        return "Frame:{} dty:{} validBit:{} cha:{} pid:{}\n".format(self._frame, self._dirty, self._validBit, self._chance, self._pid)
+        return "Frame:{} dty:{} validBit:{} cha:{} pid:{}\n".format(self.frame, self.dirty, self.isValid, self.chance, self.pid)
+
+    def __eq__(self, other):
+        return isinstance(other, Page) and self._table is other._table and self._number == other._number
+
+    def __hash__(self):
+        return hash((id(self._table), self._number))
+
+    # the packed entry
+    @property
+    def entry(self):
+        return self._table.entries[self._number]
+
+    def _setFlag(self, flag, value):
+        if value:
+            self._table.entries[self._number] |= flag
+        else:
+            self._table.entries[self._number] &= ~flag
 
     @property
     def number(self):
     	return self._number
     
+    @property
+    def pid(self):
+        return self._table.pid
+
     @property
     def isValid(self):
-        return self._validBit
+        return self._table.entries[self._number] & PTE_VALID != 0
 
     @isValid.setter
     def isValid(self, bool):
-    	self._validBit = bool
+    	self._setFlag(PTE_VALID, bool)
 
     @property
     def frame(self):
-        return self._frame
+        return self._table.entries[self._number] >> PTE_FRAME_SHIFT
     
     @frame.setter
     def frame(self, frame):
-         self._frame = frame
-         self._validBit =  True
+        flags = self._table.entries[self._number] & ((1 << PTE_FRAME_SHIFT) - 1)
+        self._table.entries[self._number] = frame << PTE_FRAME_SHIFT | flags | PTE_VALID
 
     @property
     def dirty(self):
-        return self._dirty
+        return self._table.entries[self._number] & PTE_DIRTY != 0
 
     @dirty.setter
     def dirty(self, boolean):
-        self._dirty = boolean
+        self._setFlag(PTE_DIRTY, boolean)
     
     @property
     def returnFrame(self):
         #if not self._validBit:
         #    raise Exception("no tiene frame esta pagina") 
-        self._validBit = False 
-        return self._frame
+        self._setFlag(PTE_VALID, False)
+        return self.frame
         
     @property
     def chance(self):
-        return self._chance
+        return 1 if self._table.entries[self._number] & PTE_REFERENCED else 0
+
     @chance.setter
     def chance(self, int):
-        self._chance = int
+        self._setFlag(PTE_REFERENCED, int)
 
-    @property
-    def pid(self):
-        return self._pid
     
-    @pid.setter
-    def pid(self, int):
-        self._pid = int
+## marks the ends of the load order and the free frames
+NO_FRAME = -1
+
+
+## frame table: what page is in each frame, indexed by frame number, and
+## the used frames in load order (a list linked by frame number). Every
+## operation is O(1) per frame. The flags of a frame are the ones of
+## the entry in the page table of its page
+class FrameTable():
+
+    def __init__(self, frameCount, pageTables):
+        self._pageTables = pageTables # pid -> PageTable
+        self._pids = array('i', [NO_FRAME]) * frameCount
+        self._pageNumbers = array('i', [NO_FRAME]) * frameCount
+        self._next = array('i', [NO_FRAME]) * frameCount
+        self._prev = array('i', [NO_FRAME]) * frameCount
+        self._oldest = NO_FRAME
+        self._newest = NO_FRAME
+        self._framesOf = dict() # pid -> set of frames
+        self._used = 0
+        self._loads = 0
+        self._evictions = 0
+
+    @property
+    def frameCount(self):
+        return len(self._pids)
+
+    @property
+    def loads(self):
+        return self._loads
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    def __len__(self):
+        return self._used
+
+    def isUsed(self, frame):
+        return self._pids[frame] != NO_FRAME
+
+    # the page loaded in frame is the last one
+    def add(self, frame, pid, pageNumber):
+        if self.isUsed(frame):
+            raise Exception("frame {} is used by page {} of pid {}".format(frame, self._pageNumbers[frame], self._pids[frame]))
+        self._pids[frame] = pid
+        self._pageNumbers[frame] = pageNumber
+        self._prev[frame] = self._newest
+        self._next[frame] = NO_FRAME
+        if self._newest == NO_FRAME:
+            self._oldest = frame
+        else:
+            self._next[self._newest] = frame
+        self._newest = frame
+        self._framesOf.setdefault(pid, set()).add(frame)
+        self._used += 1
+        self._loads += 1
+
+    def remove(self, frame):
+        if not self.isUsed(frame):
+            return
+        (prev, next) = (self._prev[frame], self._next[frame])
+        if prev == NO_FRAME:
+            self._oldest = next
+        else:
+            self._next[prev] = next
+        if next == NO_FRAME:
+            self._newest = prev
+        else:
+            self._prev[next] = prev
+        frames = self._framesOf[self._pids[frame]]
+        frames.discard(frame)
+        if not frames:
+            del self._framesOf[self._pids[frame]]
+        self._pids[frame] = NO_FRAME
+        self._pageNumbers[frame] = NO_FRAME
+        self._used -= 1
+
+    # a victim leaves its frame
+    def evict(self, frame):
+        self.remove(frame)
+        self._evictions += 1
+
+    # (pid, page number, flags of the entry) of a used frame
+    def entry(self, frame):
+        pid = self._pids[frame]
+        pageNumber = self._pageNumbers[frame]
+        flags = self._pageTables[pid].entries[pageNumber] & ((1 << PTE_FRAME_SHIFT) - 1)
+        return (pid, pageNumber, flags)
+
+    def page(self, frame):
+        return self._pageTables[self._pids[frame]][self._pageNumbers[frame]]
+
+    @property
+    def oldest(self):
+        return self._oldest
+
+    # the frame loaded after frame (NO_FRAME if it is the newest)
+    def nextFrame(self, frame):
+        return self._next[frame]
+
+    # used frames in load order
+    def __iter__(self):
+        frame = self._oldest
+        while frame != NO_FRAME:
+            yield frame
+            frame = self._next[frame]
+
+    def framesOf(self, pid):
+        return sorted(self._framesOf.get(pid, ()))
+
+    # the frames of pid by page number
+    def framesByPage(self, pid):
+        return sorted(self._framesOf.get(pid, ()), key = self._pageNumbers.__getitem__)
+
+    def __repr__(self):
+        rows = [[pid, len(frames), self.framesOf(pid)] for (pid, frames) in sorted(self._framesOf.items())]
+        table = tabulate(rows, headers=['pid', 'frames', 'used'], tablefmt='psql')
+        return "{}\n{} of {} frames used, {} loads, {} evictions".format(
+                table, self._used, self.frameCount, self._loads, self._evictions)
+
 
-    
 class SecondChance:
 
-    def chooseOne(self, usedFrames):
-        iterator = 0
-        maxIt = len(usedFrames)-1
+    # walks the frames in load order, clearing the chances, until
+    # a page without chance
+    def chooseOne(self, frameTable):
+        if not len(frameTable):
+            raise Exception("\n*\n* ERROR \n*\n Error no se encuentran frames ocupados\n")
+        frame = frameTable.oldest
         ret = None
-        pageNum = 0
-        while iterator <= maxIt and ret == None:
-            ret = self.selectVictim(usedFrames[iterator])
-            pageNum = iterator
-            iterator += 1
-            if maxIt <= iterator:
-                iterator=0
+        while ret == None:
+            ret = self.selectVictim(frameTable.page(frame))
+            frame = frameTable.nextFrame(frame)
+            if frame == NO_FRAME:
+                frame = frameTable.oldest
         return ret
 
     def selectVictim(self, page):
@@ -750,9 +2079,9 @@ class SecondChance:
 
 class FIFO:
 
-    def chooseOne(self, usedFrames):
-        if usedFrames : 
-            return usedFrames[0]
+    def chooseOne(self, frameTable):
+        if len(frameTable) : 
+            return frameTable.page(frameTable.oldest)
         else :
             raise Exception("\n*\n* ERROR \n*\n Error no se encuentran frames ocupados\n")
 
@@ -762,19 +2091,19 @@ class FIFO:
 
 class MemoryManager:
 
-    def __init__(self, memory, frameSize, swapMemory):
+    def __init__(self, memory, frameSize, swapMemory, mmus):
         self._memory = memory       
-        self._freeFrames = [x for x in range (0,(memory.getLeng() // frameSize)) ]
+        self._mmus = mmus # of every core, the first one reads the frames of the victims
+        self._freeFrames = deque(range(0, memory.getLeng() // frameSize))
         self._frameSize = frameSize
         self._pageTables = dict()
         self._swapMemory = swapMemory
-        self._pagesInMemory = []
+        self._frameTable = FrameTable(memory.getLeng() // frameSize, self._pageTables)
         self._victimSelector = FIFO()
 
     def allocFrames(self, numberOfFrames):
         if numberOfFrames <= len(self._freeFrames):
-            allocatedFrames = self._freeFrames[0:numberOfFrames]
-            self._freeFrames = self._freeFrames[numberOfFrames:]
+            allocatedFrames = [self._freeFrames.popleft() for x in range(0, numberOfFrames)]
 
         else:
             allocatedFrames = []
@@ -789,13 +2118,12 @@ class MemoryManager:
     def getFreeFrame(self):
         #precondicion: tengo frames libres
             #print("frames libres ,", self._freeFrames)
-            #print("paginas en memoria ", self._pagesInMemory)
             #print("cantidad paginas ,", len(self._pageTables))
             if not self.hasFreeFrame():
                 self._freeFrames.append(self.chooseVictim())
                 #print("paginas en memoria luego de sacarALaVictima ->>>>>>>", self._freeFrames)
 
-            return self._freeFrames.pop(0)
+            return self._freeFrames.popleft()
 
     def hasFreeFrame(self):
         return self._freeFrames
@@ -806,27 +2134,30 @@ class MemoryManager:
         return pagesprocess[pageNumber]
 
     def chooseVictim(self):
-       pageToRemove = self._victimSelector.chooseOne(self._pagesInMemory)
+       pageToRemove = self._victimSelector.chooseOne(self._frameTable)
        #print("pagina a Desalojar", pageToRemove)
        #print("PAGINA A REMOVEER ", pageToRemove)
        if pageToRemove.dirty:
        	   #print("INFORMACION DE LA PAGINAA GUARDAR ", pageToRemove.pid, pageToRemove.number)
-           instruct = HARDWARE.mmu.fetchInstr(pageToRemove.frame)
+           instruct = self._mmus[0].fetchInstr(pageToRemove.frame)
            self.saveProgram(pageToRemove.pid, pageToRemove.number, instruct) 
        newFreeFrame = pageToRemove.returnFrame     #volverAka
-       self.removePage(pageToRemove)
+       self._frameTable.evict(newFreeFrame)
+       # the victim (and the chances cleared) must be seen by the mmus
+       for mmu in self._mmus:
+           mmu.forgetTranslation()
        #print("Frame libre EN CHOOSE VICTIM ", newFreeFrame, pageToRemove)
        #print("pagina desalojada",pageToRemove)
        #print("Estado de la page table", self._pageTables)
        return newFreeFrame
        
+    # updates the entry in place: the mmu of the process points to its table
     def setPage(self, pid, pageNumber, page):
         #print("pageTable :\n", self._pageTables)
         process = self._pageTables[pid]
         process[pageNumber] = page
         page.isValid = True
-        self._pagesInMemory.append(page)
-        self._pageTables.update({pid: process}) 
+        self._frameTable.add(page.frame, pid, pageNumber)
 
     @property
     def frameSize(self):
@@ -834,26 +2165,36 @@ class MemoryManager:
 
     def removePage(self, page):
         #print("pagina a remover en mm ------------------>", pageNumber)
-        #print("paginas ocupando memoria  ------------------>", self._pagesInMemory)
-        self._pagesInMemory.remove(page)
+        self._frameTable.remove(page.frame)
         page.isValid = False
-        #print("paginas ocupando memoria despues de desalojo ------------------>", self._pagesInMemory)
-        #self._pagesInMemory.remove(page)
        	#pidPages = self._pageTables.get(pid)
 
         #self._pageTables.update({page.pid: pidPages})
 
     def newPageTable(self, pid):
-        self._pageTables.update({pid: []})
+        self._pageTables.update({pid: PageTable(pid, 0)})
 
     def putPageTable(self, pid, page):
         self._pageTables.update({pid: page})
 
     def getPageTable(self, pid):
         return self._pageTables.get(pid)
-    
-    def update(self, pid, pages):
-        return self._pageTables.update({pid: pages})
+
+    @property
+    def frameTable(self):
+        return self._frameTable
+
+    # frees the frames of the pages of pid in memory (by page number)
+    def releaseFrames(self, pid):
+        for frame in self._frameTable.framesByPage(pid):
+            self._frameTable.page(frame).isValid = False
+            self._frameTable.remove(frame)
+            self.freeFrames(frame)
+
+    # memory used by the page tables
+    @property
+    def pageTableBytes(self):
+        return sum(pages.bytes for pages in self._pageTables.values())
 
     @property
     def memory(self):
@@ -895,23 +2236,32 @@ class Kernel():
         pageFaultHandler = PageFaultInterruptionHandler(self)
         self._hardware.interruptVector.register(PAGE_FAULT_INTERRUPTION_TYPE, pageFaultHandler)
 
+        releaseHandler = ReleaseInterruptionHandler(self)
+        self._hardware.interruptVector.register(RELEASE_INTERRUPTION_TYPE, releaseHandler)
+
 
         ## controls the Hardware's I/O Device
         self._ioDeviceController = IoDeviceController(self._hardware.ioDevice)
 
 
-        self._pcbTable = PcbTable()
+        self._pcbTable = PcbTable(len(self._hardware.cores))
+        self._pids = pid()
+        self._metrics = SchedulingMetrics(self)
         self._dispacher = Dispacher(self)
 
         self._gantt_graphic = Gantt(self)
+        self._releases = PeriodicReleases(self)
 
-        self._scheduler = scheduler
+        self._scheduler = MultiCoreScheduler(scheduler, len(self._hardware.cores))
+        self._scheduler.clock = self._hardware.clock
         self._fileSystem = Fsb()
         self._swapMemory = SwapMemory()
-        self._hardware.mmu.frameSize = frameSize
+        for core in self._hardware.cores:
+            core.mmu.frameSize = frameSize
 
 
-        self._memoryManager = MemoryManager(self._hardware.memory, self._hardware.mmu.frameSize, self._swapMemory)
+        self._memoryManager = MemoryManager(self._hardware.memory, self._hardware.mmu.frameSize, self._swapMemory,
+                                            [core.mmu for core in self._hardware.cores])
 
         self._loader = Loader(self._fileSystem, self._memoryManager)
 
@@ -931,18 +2281,37 @@ class Kernel():
     def dispacher(self):
         return self._dispacher
 
+    @property
+    def pids(self):
+        return self._pids
+
+    @property
+    def metrics(self):
+        return self._metrics
+
+    # tick being run (the next one between ticks)
+    def now(self):
+        return self._hardware.clock.currentTick
+
     @property
     def gantt(self):
         return self._gantt_graphic
+
+    @property
+    def releases(self):
+        return self._releases
     
     @property
     def ioDeviceController(self):
         return self._ioDeviceController
          
     ## emulates a "system call" for programs execution
-    def run(self, programName, priority):
+    # deadline: ticks from now to finish (real time), worstCase: its
+    # cpu ticks (see SchedulerEDF), period: ticks between the releases of
+    # its jobs (the deadline defaults to it), jobs: how many (None: forever)
+    def run(self, programName, priority, deadline = None, worstCase = None, period = None, jobs = None):
         programCode = self.fileSystem.read(programName) # read file
-        newINT = IRQ(NEW_INTERRUPTION_TYPE, (programName, programCode, priority))
+        newINT = IRQ(NEW_INTERRUPTION_TYPE, (programName, programCode, priority, deadline, worstCase, period, jobs))
         #log.logger.info("Set New Int Handler")# ayuda visual
         self._hardware.interruptVector.handle(newINT)
         log.logger.info("\n Executing program: {name}".format(name=programName))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+
+from hardware import *
+from so import *
+from tabulate import tabulate
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+import hashlib
+import io
+import json
+import os
+import sys
+
+
+## schedulers by the name used at the cli of main.py
+SCHEDULERS = {
+    'FCFS': SchedulerFCFS,
+    'RR'  : SchedulerRRB,
+    'NP'  : SchedulerNonPreemtive,
+    'P'   : SchedulerPreemtive,
+    'SJF' : SchedulerSJF,
+    'SRTF': SchedulerSRTF,
+    'CFS' : SchedulerCFS,
+    'MLFQ': SchedulerMLFQ,
+    'STRIDE': SchedulerStride,
+    'LOTTERY': SchedulerLottery,
+    'EDF' : SchedulerEDF,
+}
+
+## schedulers that use the timer (the quantum of the others is ignored)
+QUANTUM_SCHEDULERS = frozenset(['RR', 'STRIDE', 'LOTTERY'])
+
+
+## clock subscriber that counts the ticks the pcbs spend in a state
+## (sready: waiting time, srunning: ticks on a cpu, a timeout tick too)
+class StateTicks():
+
+    def __init__(self, kernel, state):
+        self._kernel = kernel
+        self._state = state
+        self._ticks = 0
+
+    @property
+    def ticks(self):
+        return self._ticks
+
+    def tick(self, tickNbr):
+        self.skipTicks(tickNbr, 1)
+
+    def skipTicks(self, tickNbr, count):
+        for pcb in self._kernel.pcbTable.table.values():
+            if pcb.state == self._state:
+                self._ticks += count
+
+    def quietTicks(self):
+        return float('inf')
+
+
+## a configuration of the machine: a dict with the keys
+## scheduler, quantum, memory, frameSize and cores
+def makeConfig(scheduler, quantum, memory, frameSize, cores = 1):
+    if scheduler not in QUANTUM_SCHEDULERS:
+        quantum = None
+    return {'scheduler': scheduler, 'quantum': quantum, 'memory': memory,
+            'frameSize': frameSize, 'cores': cores}
+
+
+# every combination of the parameters (without duplicates)
+def grid(schedulers, quantums, memories, frameSizes, cores = [1]):
+    configs = []
+    for scheduler in schedulers:
+        for quantum in quantums:
+            for memory in memories:
+                for frameSize in frameSizes:
+                    for coreCount in cores:
+                        config = makeConfig(scheduler, quantum, memory, frameSize, coreCount)
+                        if config not in configs:
+                            configs.append(config)
+    return configs
+
+
+## runs a workload, a list of (path, program, priority), in a new
+## headless machine. Returns the measures of the run
+def runConfig(config, workload, maxTicks = 100000):
+    hardware = Hardware()
+    hardware.setup(config['memory'], config['cores'])
+    if config['quantum'] is not None:
+        hardware.quantum = config['quantum']
+    kernel = Kernel(hardware, SCHEDULERS[config['scheduler']](), frameSize = config['frameSize'])
+    readyTicks = StateTicks(kernel, State.sready)
+    kernel.dispacher.addSubscriber(readyTicks)
+
+    for (path, program, priority) in workload:
+        kernel.fileSystem.write(path, program)
+    # the cpu prints its registers on every EXIT
+    with redirect_stdout(io.StringIO()):
+        for (path, program, priority) in workload:
+            kernel.run(path, priority)
+        ticks = hardware.runUntilIdle(maxTicks)
+
+    return {
+        'ticks': ticks,
+        'finished': not kernel.pcbTable.table,
+        'contextSwitches': kernel.dispacher.contextSwitches,
+        'pageFaults': sum(core.mmu.pageFaults for core in hardware.cores),
+        'waiting': readyTicks.ticks / len(workload),
+        'instructions': sum(core.cpu.executed for core in hardware.cores),
+        'metrics': kernel.metrics.report(),
+    }
+
+
+## runs a grid of configurations over a workload in a process pool,
+## results are cached by a hash of the configuration and the workload
+class Sweep():
+
+    def __init__(self, workload, cacheFile = None, workers = None, maxTicks = 100000):
+        self._workload = workload
+        self._cacheFile = cacheFile
+        self._workers = workers
+        self._maxTicks = maxTicks
+        self._cache = dict()
+        if cacheFile is not None and os.path.exists(cacheFile):
+            with open(cacheFile) as f:
+                self._cache = json.load(f)
+
+    @property
+    def cache(self):
+        return self._cache
+
+    def key(self, config):
+        workload = [(path, program.instructions, priority) for (path, program, priority) in self._workload]
+        text = json.dumps([config, workload, self._maxTicks], sort_keys = True)
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    # returns a list of (config, result), in the order of configs
+    def run(self, configs):
+        missing = dict()
+        for config in configs:
+            key = self.key(config)
+            if key not in self._cache and key not in missing:
+                missing[key] = config
+
+        if missing:
+            with ProcessPoolExecutor(self._workers) as pool:
+                futures = {key: pool.submit(runConfig, config, self._workload, self._maxTicks)
+                           for (key, config) in missing.items()}
+                for (key, future) in futures.items():
+                    self._cache[key] = future.result()
+            self.save()
+
+        return [(config, self._cache[self.key(config)]) for config in configs]
+
+    def save(self):
+        if self._cacheFile is not None:
+            with open(self._cacheFile, 'w') as f:
+                json.dump(self._cache, f, indent = 1)
+
+    # comparison table of the results of run
+    def table(self, results):
+        rows = []
+        for (config, result) in results:
+            rows.append([
+                config['scheduler'],
+                '-' if config['quantum'] is None else config['quantum'],
+                config['memory'],
+                config['frameSize'],
+                config['cores'],
+                result['ticks'] if result['finished'] else '>{}'.format(result['ticks']),
+                result['contextSwitches'],
+                result['pageFaults'],
+                '{:.2f}'.format(result['waiting']),
+            ])
+        headers = ['scheduler', 'quantum', 'memory', 'frame', 'cores',
+                   'ticks', 'switches', 'page faults', 'avg waiting']
+        return tabulate(rows, headers, tablefmt='psql')
+
+
+##
+##  MAIN
+##  python sweep.py [cacheFile]
+##
+if __name__ == '__main__':
+    prg1 = Program([ASM.CPU(2), ASM.IO(), ASM.CPU(3), ASM.IO(), ASM.CPU(2)])
+    prg2 = Program([ASM.INCA(3), ASM.CPU(4)])
+    prg3 = Program([ASM.CPU(3), ASM.IO(), ASM.CPU(1)])
+    workload = [("/prg1", prg1, 1), ("/prg2", prg2, 0), ("/prg3", prg3, 0)]
+
+    cacheFile = sys.argv[1] if len(sys.argv) > 1 else None
+    sweep = Sweep(workload, cacheFile)
+    configs = grid(sorted(SCHEDULERS), [2, 4], [8, 16, 32], [2, 4])
+    print(sweep.table(sweep.run(configs)))
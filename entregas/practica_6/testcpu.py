@@ -14,7 +14,8 @@ if __name__ == '__main__':
     log.logger.info('Starting emulator')
 
     ## setup our hardware and set memory size to 32 "cells"
-    HARDWARE.setup(32)
+    hardware = Hardware()
+    hardware.setup(32)
 
     SCHEDULER_FCFS = 'FCFS'
     SCHEDULER_RR = 'RR'
@@ -28,7 +29,7 @@ if __name__ == '__main__':
         sche = sys.argv[1]
 
     if sche == SCHEDULER_RR:
-        timer = HARDWARE.timer
+        timer = hardware.timer
         timer.quantum = 2
         scheduler = SchedulerRRB()
     if sche == SCHEDULER_FCFS:
@@ -42,11 +43,11 @@ if __name__ == '__main__':
 
 
     ## Switch on computer
-    HARDWARE.switchOn()
+    hardware.switchOn()
 
     ## new create the Operative System Kernel
     # "booteamos" el sistema operativo
-    kernel = Kernel(HARDWARE,scheduler, frameSize = 8)
+    kernel = Kernel(hardware,scheduler, frameSize = 8)
     # sleep(1)
 
     # Ahora vamos a intentar ejecutar 3 programas a la vez